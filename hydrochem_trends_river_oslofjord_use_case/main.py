@@ -1,8 +1,12 @@
 import argparse
+import os
 import matplotlib.pyplot as plt
 
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from joblib import cpu_count
+
 from src.utils import load_json as load_cfg
 from src.preprocess import preprocess
 from src.interpolate import interpolate
@@ -26,6 +30,15 @@ def available_names(base_dir: Path) -> list[str]:
     return sorted([p.name for p in base_dir.iterdir() if p.is_dir()])
 
 
+def _init_worker(inner_cpus: int) -> None:
+    # worker processes only write figures to disk, never to a window
+    plt.switch_backend("Agg")
+    # interpolate.json asks joblib for n_jobs=-1; share the cores between the
+    # workers instead of giving each of them all of them (loky reads this on
+    # every cpu_count(), so explicit n_jobs=-1 follows it too)
+    os.environ["LOKY_MAX_CPU_COUNT"] = str(inner_cpus)
+
+
 def run_river(
     river: str,
     steps: list[str],
@@ -97,6 +110,16 @@ def main():
         default=None,
         help="Optional override for sites used in trends (otherwise uses cfg['site_li'] or cfg['sites'])",
     )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Run the per-river preprocess/interpolate/fluxes steps in this many processes. "
+            "The joblib pools inside each of them (GAM n_jobs/var_n_jobs = -1 in interpolate.json) "
+            "are then limited to cpu_count // workers cores, so the total stays at cpu_count"
+        ),
+    )
 
     args = ap.parse_args()
 
@@ -136,15 +159,23 @@ def main():
         if missing_marine:
             raise SystemExit(f"Unknown marine datasets: {missing_marine}. Available: {marine_all}")
 
-    for r in rivers:
-        run_river(
-            r,
-            steps,
-            cfg_river_base,
-            trend_freq=args.trend_freq,
-            mk_mode=args.mk_mode,
-            trend_sites=args.trend_sites,
-        )
+    trend_kw = dict(trend_freq=args.trend_freq, mk_mode=args.mk_mode, trend_sites=args.trend_sites)
+
+    if args.workers > 1 and len(rivers) > 1:
+        # Rivers are independent up to the trends step, which reads all of them
+        river_steps = [s for s in steps if s != "trends"]
+        workers = min(args.workers, len(rivers))
+        inner_cpus = max(1, cpu_count() // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(inner_cpus,)) as pool:
+            futures = [pool.submit(run_river, r, river_steps, cfg_river_base, **trend_kw) for r in rivers]
+            for fut in futures:
+                fut.result()
+        if "trends" in steps:
+            for r in rivers:
+                run_river(r, ["trends"], cfg_river_base, **trend_kw)
+    else:
+        for r in rivers:
+            run_river(r, steps, cfg_river_base, **trend_kw)
 
     # # Run marine trends
     # for ds in marine:
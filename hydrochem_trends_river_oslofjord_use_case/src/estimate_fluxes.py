@@ -5,19 +5,24 @@ import uuid
 from pathlib import Path
 from typing import Any, Dict, Optional
 
+import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import xarray as xr
+from matplotlib.collections import LineCollection
 
 from src.export_netcdf import export_dataset
 # from src.utils import ensure_dirs
 from src.utils import (
     ensure_dirs,
     resolve_path,
+    ensure_datetime,
+    dataset_to_dataframe,
     netcdf_to_dataframe,
     standardize_time_and_station,
     merge_daily_discharge_and_chemistry,
+    new_figure,
     save_or_show_plot
 )
 
@@ -70,19 +75,30 @@ def build_global_attrs_for_flux(
     return {k: str(v) for k, v in base.items()}
 
 # ----------------------------- metadata helpers -----------------------------
-def extract_units_from_netcdf(netcdf_path: Path, skip_vars=("date", "latitude", "longitude", "river_name")) -> pd.DataFrame:
-    """ Read variable units from the *modeled/interpolated* chemistry NetCDF. """
-
-    with xr.open_dataset(netcdf_path) as ds:
-        metadata = []
-        for var in ds.data_vars:
-            if var in skip_vars:
-                continue
-            unit = ds[var].attrs.get("units", "unknown")
-            metadata.append({"parameter_name": var, "unit": unit})
-    return pd.DataFrame(metadata)
+def extract_units(ds: xr.Dataset, skip_vars=("date", "latitude", "longitude", "river_name")) -> Dict[str, str]:
+    """ Map variable -> units from the *modeled/interpolated* chemistry dataset. """
+    return {
+        str(var): ds[var].attrs.get("units", "unknown")
+        for var in ds.data_vars
+        if var not in skip_vars
+    }
 
 # ----------------------------- flux computation -----------------------------
+# Concentration unit -> factor to kg/m3 (proxy Abs/cm is kept "as is")
+CONC_UNIT_FACTORS: Dict[str, float] = {
+    "mg/l": 1e-3,
+    "mg/l C": 1e-3,
+    "mg Pt/l": 1e-3,
+    "µg/l": 1e-6,
+    "μg/l": 1e-6,
+    "µg/l P": 1e-6,
+    "Abs/cm": 1.0,
+}
+
+def conc_unit_factor(unit: str) -> Optional[float]:
+    """ Factor converting a concentration unit to kg/m3, or None if the unit is unknown. """
+    return CONC_UNIT_FACTORS.get(unit.strip())
+
 def compute_fluxes(
     df: pd.DataFrame,
     *,
@@ -103,33 +119,29 @@ def compute_fluxes(
     if keep_cols is None:
         keep_cols = ["date"]
 
-    df = df.copy()
-    q_m3_per_day = df[discharge_col] * 86400.0  # m3/s -> m3/day
-
-    flux_df = pd.DataFrame(index=df.index)
-
+    # resolve unit factors once, then compute all fluxes in one vectorized step
+    flux_vars: list[str] = []
+    scale: list[float] = []
     for var in df.columns:
         if var in keep_cols or var == discharge_col:
             continue
         if var not in param_unit_map:
             continue
-
-        unit = str(param_unit_map[var])
-
-        # Concentration to kg/m3
-        if unit.endswith(("mg/l", "mg/l C", "mg Pt/l")):
-            conc_kg_m3 = df[var] * 1e-3
-        elif unit.endswith(("µg/l", "μg/l", "µg/l P")):
-            conc_kg_m3 = df[var] * 1e-6
-        elif unit.endswith("Abs/cm"):
-            # not mass concentration; keep as-is (proxy)
-            conc_kg_m3 = df[var]
-        else:
+        factor = conc_unit_factor(str(param_unit_map[var]))
+        if factor is None:
             # unknown unit
             continue
+        flux_vars.append(var)
+        scale.append(factor)
 
-        # tonnes/day (kg/m3 * m3/day = kg/day; /1000 = tonnes/day)
-        flux_df[var] = conc_kg_m3 * q_m3_per_day / 1000.0
+    # own copy of the concentration block; both scalings below are done in place on it
+    flux = df[flux_vars].to_numpy(dtype=np.float64, copy=True)
+    q = df[discharge_col].to_numpy(dtype=np.float64)
+
+    # tonnes/day: kg/m3 * m3/s * 86400 s/day / 1000 kg/tonne
+    flux *= np.asarray(scale, dtype=np.float64)
+    flux *= (q * 86.4)[:, None]
+    flux_df = pd.DataFrame(flux, index=df.index, columns=flux_vars, copy=False)
 
     for col in keep_cols:
         if col in df.columns:
@@ -137,6 +149,39 @@ def compute_fluxes(
 
     return flux_df
 
+def resample_sum(df: pd.DataFrame, *, freq: str, min_count: int) -> pd.DataFrame:
+    """
+    Bucketed NaN-aware sum of a datetime-indexed frame to month ends ("ME") or year ends ("YE").
+    Same result as df.resample(freq).sum(min_count=min_count), computed with one np.bincount.
+    """
+    idx = pd.DatetimeIndex(df.index)
+    if freq == "ME":
+        bucket = idx.year.to_numpy() * 12 + idx.month.to_numpy() - 1
+        offset = pd.offsets.MonthEnd(0)
+    elif freq == "YE":
+        bucket = idx.year.to_numpy()
+        offset = pd.offsets.YearEnd(0)
+    else:
+        raise ValueError(f"Unsupported resample frequency '{freq}' (use 'ME' or 'YE').")
+
+    if idx.empty:
+        return df.resample(freq).sum(min_count=min_count)
+
+    bucket = bucket - bucket.min()
+    n_buckets = int(bucket.max()) + 1
+    n_cols = df.shape[1]
+
+    vals = df.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(vals)
+    keys = (bucket[:, None] * n_cols + np.arange(n_cols)).ravel()
+    sums = np.bincount(keys, weights=np.where(valid, vals, 0.0).ravel(), minlength=n_buckets * n_cols)
+    counts = np.bincount(keys, weights=valid.ravel(), minlength=n_buckets * n_cols)
+    sums = sums.reshape(n_buckets, n_cols)
+    sums[counts.reshape(n_buckets, n_cols) < min_count] = np.nan
+
+    out_idx = pd.date_range(idx.min().normalize() + offset, periods=n_buckets, freq=freq, name=idx.name)
+    return pd.DataFrame(sums, index=out_idx, columns=df.columns)
+
 # ----------------------------- plotting -----------------------------
 def plot_flux_grid(
     df: pd.DataFrame,
@@ -148,17 +193,40 @@ def plot_flux_grid(
     y_mass_label: str,
     save_path: Optional[Path] = None,
 ) -> None:
-    flux_vars = df.select_dtypes(include="number").columns.tolist()
-    if "year" in flux_vars:
-        flux_vars.remove("year")
+    num_cols = [c for c in df.select_dtypes(include="number").columns if c != "year"]
+    # Skip variables with no data at all (one pass over the numeric block)
+    all_nan = np.isnan(df[num_cols].to_numpy(dtype=float)).all(axis=0)
+    flux_vars = [c for c, empty in zip(num_cols, all_nan) if not empty]
 
     cols = 3
     rows = math.ceil(len(flux_vars) / cols) if flux_vars else 1
-    fig, axes = plt.subplots(rows, cols, figsize=(5 * cols, 3 * rows), sharex=False)
+    fig, axes = new_figure(
+        save_path=save_path, nrows=rows, ncols=cols, figsize=(5 * cols, 3 * rows), sharex=False
+    )
     axes = np.array(axes).flatten()
 
+    # Daily series are long and drawn without markers: one LineCollection per axis
+    # is much cheaper to build than a Line2D. Gaps (NaN runs) split the segments.
+    as_collection = title_suffix == "Daily Fluxes"
+    if as_collection:
+        x_vals = np.asarray(x)
+        x_is_date = np.issubdtype(x_vals.dtype, np.datetime64)
+        x_num = mdates.date2num(pd.DatetimeIndex(x_vals)) if x_is_date else x_vals
+        # gaps in the lines: the NaN mask of the plotted variables
+        notna = ~np.isnan(df[flux_vars].to_numpy(dtype=float))
+        color = plt.rcParams["axes.prop_cycle"].by_key()["color"][0]
+
     for i, var in enumerate(flux_vars):
-        axes[i].plot(x, df[var], marker="o" if title_suffix != "Daily Fluxes" else None)
+        if as_collection:
+            y = df[var].to_numpy(dtype=float)
+            runs = np.flatnonzero(np.diff(np.concatenate(([0], notna[:, i].astype(np.int8), [0]))))
+            segments = [np.column_stack((x_num[a:b], y[a:b])) for a, b in zip(runs[::2], runs[1::2])]
+            axes[i].add_collection(LineCollection(segments, colors=color))
+            axes[i].autoscale_view()
+            if x_is_date:
+                axes[i].xaxis_date()
+        else:
+            axes[i].plot(x, df[var], marker="o")
         axes[i].set_title(var)
         axes[i].tick_params(axis="x", labelrotation=45)
         if var not in non_mass_vars:
@@ -171,7 +239,7 @@ def plot_flux_grid(
     fig.suptitle(f"{station_name} – {title_suffix}", fontsize=16)
     fig.tight_layout(rect=[0, 0, 1, 0.96])
 
-    save_or_show_plot(save_path=save_path, dpi=300)
+    save_or_show_plot(save_path=save_path, dpi=300, fig=fig)
 
 
 # ---------------------------- export via export_dataset ----------------------------
@@ -222,22 +290,27 @@ def df_to_dataset(
     frequency: str,
     non_mass_vars: set[str],
     undefined_unit_label: str = "undefined",
+    float_dtype: Optional[str] = None,
 ) -> xr.Dataset:
     """
     Convert a pandas DataFrame (daily/monthly/annual) to an xarray Dataset
     with consistent metadata (units, long_name, comments, coords).
+    If float_dtype is given (e.g. "float32"), float columns are downcast first.
     """
 
-    df = df.copy()
+    # Every step below returns a new frame, so the caller's df is never mutated
+    if float_dtype:
+        float_cols = df.select_dtypes(include="float").columns
+        df = df.astype({c: float_dtype for c in float_cols})
 
     # Ensure we have a proper datetime index in the Dataset
     if time_name in df.columns:
-        df[time_name] = pd.to_datetime(df[time_name])
         df = df.set_index(time_name)
+        df.index = pd.to_datetime(df.index)
     elif not pd.api.types.is_datetime64_any_dtype(df.index):
         raise ValueError(f"Expected '{time_name}' column or datetime index.")
 
-    df.index.name = time_name
+    df = df.rename_axis(time_name)
 
     ds = xr.Dataset.from_dataframe(df)
 
@@ -253,14 +326,17 @@ def df_to_dataset(
 
     ds["river_name"] = xr.DataArray(river, dims=(), attrs={"cf_role": "timeseries_id"})
 
+    # parameter_name -> unit, first entry wins (as with the old .iloc[0] lookup)
+    meta_units: Dict[str, Any] = {}
+    if not flux_metadata_df.empty:
+        for name, unit in zip(flux_metadata_df["parameter_name"], flux_metadata_df["unit"]):
+            meta_units.setdefault(name, unit)
+
     for var in ds.data_vars:
         if var == "river_name":
             continue
 
-        if not flux_metadata_df.empty and var in set(flux_metadata_df["parameter_name"]):
-            base_unit = flux_metadata_df.loc[flux_metadata_df["parameter_name"] == var, "unit"].iloc[0]
-        else:
-            base_unit = ds[var].attrs.get("units", "undefined")
+        base_unit = meta_units.get(var, ds[var].attrs.get("units", "undefined"))
 
         ds[var].attrs["units"] = _flux_unit_for_frequency(
             str(base_unit),
@@ -320,6 +396,7 @@ def flux(cfg: Dict[str, Any]) -> list[Path]:
     nc_format = export_cfg.get("format", "NETCDF4")
     time_enc_cfg = export_cfg.get("time", {})
     time_name = time_enc_cfg.get("name", "date")
+    data_var_enc = export_cfg.get("data_vars", {})
     filename_template = export_cfg.get("filename_template", "{frequency}_water_chemistry_fluxes_{station_id_or_stem}.nc")
     # id_prefix = export_cfg.get("id_prefix", "no.niva")
 
@@ -333,8 +410,13 @@ def flux(cfg: Dict[str, Any]) -> list[Path]:
     non_mass_vars = set(unit_opt.get("non_mass_vars", []))
     undefined_unit_label = str(unit_opt.get("undefined_unit_label", "undefined"))
 
-    wc_df_raw = netcdf_to_dataframe(wc_path, time_vars=("date", "sample_date", "time"))
-    q_df_raw = netcdf_to_dataframe(q_path, time_vars=("date", "sample_date", "time"))
+    # One open serves both the dataframe and the unit map
+    with xr.open_dataset(wc_path) as wc_ds:
+        wc_df_raw = dataset_to_dataframe(wc_ds, time_vars=("date", "sample_date", "time"))
+        param_unit_map = extract_units(wc_ds)
+    q_df_raw = netcdf_to_dataframe(
+        q_path, time_vars=("date", "sample_date", "time"), variables=[discharge_col, "station_name"]
+    )
 
     q_df = standardize_time_and_station(
         q_df_raw,
@@ -365,16 +447,13 @@ def flux(cfg: Dict[str, Any]) -> list[Path]:
         drop_wc_cols=cfg.get("columns_to_drop", False),
     )
 
-    param_meta_df = extract_units_from_netcdf(wc_path)
-    param_unit_map = dict(zip(param_meta_df["parameter_name"], param_meta_df["unit"]))
-
     daily_flux = compute_fluxes(
         merged,
         param_unit_map=param_unit_map,
         discharge_col=discharge_col,
         keep_cols=[date_col],
     )
-    daily_flux[date_col] = pd.to_datetime(daily_flux[date_col])
+    daily_flux[date_col] = ensure_datetime(daily_flux[date_col])
 
     # Monthly + annual aggregation
     daily_idx = daily_flux.set_index(date_col)
@@ -385,14 +464,10 @@ def flux(cfg: Dict[str, Any]) -> list[Path]:
     else:
         daily_idx_no_q = daily_idx
 
-    monthly_flux = daily_idx_no_q.resample("ME").sum(min_count=25)
-    annual_flux = daily_idx_no_q.resample("YE").sum(min_count=350)
+    monthly_flux = resample_sum(daily_idx_no_q, freq="ME", min_count=25)
+    annual_flux = resample_sum(daily_idx_no_q, freq="YE", min_count=350)
 
-    # Annual needs year column for plotting
-    annual_plot = annual_flux.copy()
-    annual_plot["year"] = annual_plot.index.year
-
-    daily_sorted = daily_flux.copy().sort_values(date_col)
+    daily_sorted = daily_flux.sort_values(date_col)
     plot_flux_grid(
         daily_sorted,
         river,
@@ -413,8 +488,8 @@ def flux(cfg: Dict[str, Any]) -> list[Path]:
         save_path=plots_output_dir / f"{river.lower()}_monthly_fluxes.png",
     )
 
-    annual_plot = annual_flux.copy()
-    annual_plot["year"] = annual_plot.index.year
+    # Annual needs year column for plotting
+    annual_plot = annual_flux.assign(year=annual_flux.index.year)
     plot_flux_grid(
         annual_plot,
         river,
@@ -443,6 +518,7 @@ def flux(cfg: Dict[str, Any]) -> list[Path]:
             frequency=frequency,
             non_mass_vars=non_mass_vars,
             undefined_unit_label=undefined_unit_label,
+            float_dtype=data_var_enc.get("dtype"),
         )
 
         gmeta = build_global_attrs_for_flux(cfg, station_id=river, frequency=frequency)
@@ -487,6 +563,7 @@ def flux(cfg: Dict[str, Any]) -> list[Path]:
                 "calendar": time_enc_cfg.get("calendar", None),
             },
             var_encoding_overrides=None,
+            data_var_encoding=data_var_enc,
         )
         outputs.append(out_path)
 
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, Optional, Union
 
@@ -17,6 +19,9 @@ except Exception:
         for p in paths:
             Path(p).mkdir(parents=True, exist_ok=True)
 
+# Creation timestamp, formatted once per run and shared by every exported file
+DATE_CREATED = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
 # ------------------------- small internal helpers -------------------------
 def _as_utc_string(ts) -> str:
     """Convert to pandas Timestamp, force UTC, then output ISO 8601 with Z."""
@@ -25,6 +30,12 @@ def _as_utc_string(ts) -> str:
     return t.strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
+@lru_cache(maxsize=None)
+def _dataset_uuid(namespace_uuid: str, id_seed: str) -> uuid.UUID:
+    """uuid5 of id_seed in the namespace, memoized per (namespace, seed)."""
+    return uuid.uuid5(uuid.UUID(namespace_uuid), id_seed)
+
+
 def _infer_time_name(ds: xr.Dataset, explicit: Optional[str]) -> Optional[str]:
     """
     Choose a time coordinate name:
@@ -44,11 +55,25 @@ def _build_encoding(
     time_name: Optional[str],
     time_cfg: Optional[Dict[str, Any]],
     var_overrides: Optional[Dict[str, Dict[str, Any]]],
+    data_var_defaults: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """Create an xarray encoding dict."""
 
     enc: Dict[str, Any] = {}
 
+    # Default encoding for floating data variables (e.g. float32 + zlib).
+    # "chunk_length" is not an xarray key: it caps the HDF5 chunk size per dim.
+    if data_var_defaults:
+        defaults = dict(data_var_defaults)
+        chunk_length = defaults.pop("chunk_length", None)
+        for var in ds.data_vars:
+            da = ds[var]
+            if da.dtype.kind != "f" or da.ndim == 0:
+                continue
+            enc[var] = dict(defaults)
+            if chunk_length and all(n > 0 for n in da.shape):
+                enc[var]["chunksizes"] = tuple(min(n, int(chunk_length)) for n in da.shape)
+
     # Time coordinate encoding
     tcfg = time_cfg or {}
     if time_name and time_name in ds.coords:
@@ -150,12 +175,15 @@ def export_dataset(
     nc_format: str = "NETCDF4",
     time_encoding_cfg: Optional[Dict[str, Any]] = None,
     var_encoding_overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+    data_var_encoding: Optional[Dict[str, Any]] = None,
 ) -> Path:
     """
     Write an xarray.Dataset to NetCDF with consistent metadata and encodings.
 
     Caller-provided global_attrs override default_global_attrs.
     Coverage & geospatial fields are overwritten to reflect the dataset contents.
+    data_var_encoding is applied to every floating data variable before
+    var_encoding_overrides.
     """
     output_dir = Path(output_dir)
     ensure_dirs(output_dir)
@@ -178,8 +206,7 @@ def export_dataset(
     # Stable dataset ID (optional)
     if "id" not in attrs and namespace_uuid and id_prefix and id_seed:
         try:
-            ns = uuid.UUID(str(namespace_uuid))
-            attrs["id"] = f"{id_prefix}:{uuid.uuid5(ns, str(id_seed))}"
+            attrs["id"] = f"{id_prefix}:{_dataset_uuid(str(namespace_uuid), str(id_seed))}"
         except Exception:
             pass
 
@@ -199,17 +226,18 @@ def export_dataset(
         attrs["geospatial_lon_max"] = lon
 
     # date_created: keep user value if present; otherwise set to now (UTC)
-    attrs.setdefault("date_created", pd.Timestamp.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"))
+    attrs.setdefault("date_created", DATE_CREATED)
 
     # Attach final global attributes (NetCDF global attrs are typically strings)
     ds.attrs = {k: str(v) for k, v in attrs.items()}
 
-    # Encoding (time + coords + per-var overrides)
+    # Encoding (data var defaults + time + coords + per-var overrides)
     encoding = _build_encoding(
         ds,
         time_name=tn,
         time_cfg=time_encoding_cfg,
         var_overrides=var_encoding_overrides,
+        data_var_defaults=data_var_encoding,
     )
 
     # Write file
@@ -1,15 +1,19 @@
 from __future__ import annotations
 
+from copy import deepcopy
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Tuple, Mapping
-from src.export_netcdf import export_dataset
+from src.export_netcdf import DATE_CREATED, export_dataset
 
 from src.utils import (
     ensure_dirs,
     resolve_path,
+    ensure_datetime,
     netcdf_to_dataframe,
     standardize_time_and_station,
     merge_daily_discharge_and_chemistry,
+    new_figure,
+    save_or_show_plot,
 )
 
 import numpy as np
@@ -17,8 +21,8 @@ import pandas as pd
 import xarray as xr
 import matplotlib.pyplot as plt
 
+from joblib import Memory, Parallel, delayed  # installed with scikit-learn
 from pygam import LinearGAM, s, te
-from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
 plt.style.use("ggplot")
@@ -123,18 +127,68 @@ def build_global_attrs(
 
     # timestamps
     if md_timestamps.get("date_created") == "auto":
-        base["date_created"] = pd.Timestamp.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+        base["date_created"] = DATE_CREATED
     else:
         base.setdefault("date_created", md_timestamps.get("date_created"))
 
     # ensure strings
     return {k: str(v) for k, v in base.items()}
 
+def _netcdf_to_dataframe_keyed(nc_path: str, mtime_ns: int, size: int, **kwargs) -> pd.DataFrame:
+    """mtime_ns/size are unused here; they only key the cache entry for nc_path."""
+    return netcdf_to_dataframe(nc_path, **kwargs)
+
+def load_netcdf_cached(memory: Memory, nc_path: Path, **kwargs) -> pd.DataFrame:
+    """netcdf_to_dataframe through memory; a rewritten file gets a new cache entry."""
+    st = Path(nc_path).stat()
+    return memory.cache(_netcdf_to_dataframe_keyed)(str(nc_path), st.st_mtime_ns, st.st_size, **kwargs)
+
 # ------------------------- interpolation -------------------------
+def _linear_interp_capped(values: np.ndarray, max_gap: int) -> np.ndarray:
+    """
+    NumPy equivalent of Series.interpolate(method="linear", limit=max_gap) on
+    evenly spaced samples: at most max_gap NaNs are filled after each valid
+    value, leading NaNs stay NaN and trailing NaNs take the last valid value.
+    """
+    pos = np.arange(values.size)
+    valid = ~np.isnan(values)
+    if valid.all() or not valid.any():
+        return values.copy()
+    filled = np.interp(pos, pos[valid], values[valid])
+    last_valid = np.maximum.accumulate(np.where(valid, pos, -1))
+    keep = valid | ((last_valid >= 0) & (pos - last_valid <= max_gap))
+    return np.where(keep, filled, np.nan)
+
+def _max_run(mask: np.ndarray) -> int:
+    """Length of the longest run of True in a 1-D boolean array (0 if none)."""
+    edges = np.diff(np.concatenate(([False], mask, [False])).astype(np.int8))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    return int((ends - starts).max()) if starts.size else 0
+
+def _r2_on_overlap(y_obs: np.ndarray, obs_mask: np.ndarray, y_pred: np.ndarray, min_n: int = 10) -> Optional[float]:
+    """
+    r2_score(y_obs, y_pred) over the days where both are present,
+    or None with fewer than min_n such days. Same constant-target rule as sklearn.
+    """
+    m = obs_mask & ~np.isnan(y_pred)
+    if m.sum() < min_n:
+        return None
+    y, yp = y_obs[m], y_pred[m]
+    ss_res = float(((y - yp) ** 2).sum())
+    ss_tot = float(((y - y.mean()) ** 2).sum())
+    if ss_tot == 0:
+        return 1.0 if ss_res == 0 else 0.0
+    return 1.0 - ss_res / ss_tot
+
 def interpolate_with_gap_limit(series: pd.Series, max_gap: int, method="linear", order=None) -> pd.Series:
     """Interpolate a series but only across gaps up to max_gap samples."""
     if method in ["spline", "polynomial"] and order is None:
         raise ValueError(f"Interpolation method '{method}' requires 'order'.")
+    if method == "linear" and pd.api.types.is_float_dtype(series):
+        return pd.Series(
+            _linear_interp_capped(series.to_numpy(), int(max_gap)),
+            index=series.index, name=series.name,
+        )
     return series.interpolate(method=method, limit=max_gap, order=order)
 
 def interpolate_station_df(
@@ -150,8 +204,8 @@ def interpolate_station_df(
 
     if not meta_cols:
         raise ValueError("meta_cols required for ffill/bfill (e.g., ['river_name']).")
-    out = df.copy()
-    out[date_col] = pd.to_datetime(out[date_col])
+    out = df.copy(deep=False)
+    out[date_col] = ensure_datetime(out[date_col])
     out = out.drop_duplicates(subset=date_col).set_index(date_col).resample("D").asfreq()
 
     for c in meta_cols:
@@ -164,6 +218,32 @@ def interpolate_station_df(
     return out.reset_index()
 
 
+def _fit_gam_for_lam(model: LinearGAM, X: np.ndarray, y: np.ndarray, lam: float) -> Optional[LinearGAM]:
+    """Fit a copy of model with one smoothing value (no warm start); None if the fit fails."""
+    gam = deepcopy(model)
+    gam.set_params(lam=lam)
+    try:
+        return gam.fit(X, y)
+    except ValueError:
+        return None
+
+
+def gam_gridsearch(model: LinearGAM, X: np.ndarray, y: np.ndarray, lam_grid: np.ndarray, n_jobs: int = 1) -> LinearGAM:
+    """
+    Select lam by GCV, like LinearGAM.gridsearch(X, y, lam=lam_grid).
+    n_jobs=1 uses pyGAM's own (warm-started) gridsearch; otherwise each lam
+    candidate is fit independently on a joblib worker.
+    """
+    if n_jobs == 1:
+        return model.gridsearch(X, y, lam=lam_grid, progress=False)
+
+    fits = Parallel(n_jobs=n_jobs)(delayed(_fit_gam_for_lam)(model, X, y, lam) for lam in lam_grid)
+    fits = [g for g in fits if g is not None]
+    if not fits:
+        raise ValueError("No GAM could be fitted for any lam in the grid.")
+    return min(fits, key=lambda g: g.statistics_["GCV"])
+
+
 def compute_gam(
     df: pd.DataFrame,
     var: str,
@@ -172,34 +252,42 @@ def compute_gam(
     station_name: Optional[str] = None,
     n_splines_xy: Tuple[int, int] = (10, 20),
     lam_grid: Optional[np.ndarray] = None,
+    n_jobs: int = 1,
+    memory: Optional[Memory] = None,
 ) -> Optional[pd.DataFrame]:
-    """Fit a GAM on discharge and day - of - year and predict within the observed time range."""
+    """
+    Fit a GAM on discharge and day - of - year and predict within the observed time range.
+    With a joblib Memory the fitted model is cached on the contents of (model, X, y, lam_grid).
+    """
 
-    out = df.copy()
-    out[date_col] = pd.to_datetime(out[date_col])
-    out["doy"] = out[date_col].dt.dayofyear
+    # shallow copy: only new/replaced columns are assigned below
+    out = df.copy(deep=False)
+    out[date_col] = ensure_datetime(out[date_col])
+    if "doy" not in out.columns:
+        out["doy"] = out[date_col].dt.dayofyear.astype(np.int16)
 
-    train = out.dropna(subset=[var, discharge_col, "doy"]).copy()
+    train = out.dropna(subset=[var, discharge_col, "doy"])
     if train.empty:
         print(f"No training data for {station_name} -> {var}")
         return None
 
-    X = train[[discharge_col, "doy"]].values
-    y = train[var].values
+    X = train[[discharge_col, "doy"]].to_numpy(dtype=np.float64)
+    y = train[var].to_numpy(dtype=np.float64)
 
     if lam_grid is None:
         lam_grid = np.logspace(-3, 3, 7)
 
     model = LinearGAM(te(0, 1, n_splines=list(n_splines_xy), spline_order=[3, 3]) + s(1, basis="cp"))
+    search = memory.cache(gam_gridsearch) if memory is not None else gam_gridsearch
     try:
-        gam = model.gridsearch(X, y, lam=lam_grid)
+        gam = search(model, X, y, lam_grid, n_jobs=n_jobs)
     except Exception as e:
         print(f"GAM failed for {station_name} → {var}: {e}")
         return None
 
     first, last = train[date_col].min(), train[date_col].max()
     mask = (out[discharge_col].notna() & out["doy"].notna() & (out[date_col] >= first) & (out[date_col] <= last))
-    Xp = out.loc[mask, [discharge_col, "doy"]].values
+    Xp = out.loc[mask, [discharge_col, "doy"]].to_numpy(dtype=np.float64)
     yp = gam.predict(Xp)
     yp[yp < 0] = 0
 
@@ -223,22 +311,46 @@ def apply_gam_to_df(
     station_name="",
     n_splines_xy=(10, 20),
     lam_grid=None,
+    n_jobs=1,
+    var_n_jobs=1,
+    memory: Optional[Memory] = None,
 ) -> pd.DataFrame:
+    """
+    Add a {var}_annual_gam column per variable.
+    var_n_jobs != 1 fits the variables on joblib workers (each with a sequential lam grid).
+    """
 
-    out = df.copy()
-    for var in variables:
-        if var in out.columns:
-            gdf = compute_gam(
-                out, var,
-                discharge_col=discharge_col,
-                date_col=date_col,
-                station_name=station_name,
-                n_splines_xy=n_splines_xy,
-                lam_grid=lam_grid,
-            )
+    out = df.copy(deep=False)
+    present = [var for var in variables if var in out.columns]
+    gam_kw = dict(
+        discharge_col=discharge_col,
+        date_col=date_col,
+        station_name=station_name,
+        n_splines_xy=n_splines_xy,
+        lam_grid=lam_grid,
+        memory=memory,
+    )
+
+    if var_n_jobs == 1:
+        for var in present:
+            gdf = compute_gam(out, var, n_jobs=n_jobs, **gam_kw)
             if gdf is not None:
                 out = gdf
-    return out
+        return out
+
+    # fits only read var, discharge and date, so they are independent of each other
+    results = Parallel(n_jobs=var_n_jobs, batch_size=1)(
+        delayed(compute_gam)(out, var, n_jobs=1, **gam_kw) for var in present
+    )
+    base = None
+    for var, gdf in zip(present, results):
+        if gdf is None:
+            continue
+        if base is None:
+            base = gdf
+        else:
+            base[f"{var}_annual_gam"] = gdf[f"{var}_annual_gam"]
+    return out if base is None else base
 
 
 def monthly_to_daily_for_year(monthly_df: pd.DataFrame, year: int) -> pd.DataFrame:
@@ -261,31 +373,83 @@ def monthly_to_daily_for_year(monthly_df: pd.DataFrame, year: int) -> pd.DataFra
     except KeyError:
         pass
 
-    tmp = tmp.interpolate(method="time")
-    tmp = tmp.map(lambda x: 0 if pd.notna(x) and x < 0 else x)
-    return tmp
+    vals = _interpolate_within_blocks(tmp.to_numpy(dtype=np.float64), np.zeros(len(tmp), dtype=np.int64))
+    vals = np.where(vals < 0, 0.0, vals)
+    return pd.DataFrame(vals, index=tmp.index, columns=tmp.columns)
 
-def monthly_medians_to_daily_all_years(station_df: pd.DataFrame, variables: List[str], date_col="date") -> pd.DataFrame:
-    """ Compute monthly medians per year and interpolate to daily values. """
+def _interpolate_within_blocks(values: np.ndarray, block: np.ndarray) -> np.ndarray:
+    """
+    Linear interpolation down the rows of a 2-D array of evenly spaced samples,
+    never across a change in block id (e.g. year). Per block this matches
+    DataFrame.interpolate(method="time") on a daily index: leading NaNs stay NaN,
+    trailing NaNs take the last valid value.
+    """
+    n = values.shape[0]
+    pos = np.arange(n)[:, None]
+    valid = ~np.isnan(values)
+
+    starts = np.flatnonzero(np.r_[True, block[1:] != block[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    run = np.cumsum(np.r_[True, block[1:] != block[:-1]]) - 1
+    block_start, block_end = starts[run][:, None], ends[run][:, None]
 
-    s = station_df.copy()
-    s[date_col] = pd.to_datetime(s[date_col])
-    s = s.set_index(date_col)
-    daily_chunks = []
+    prev = np.maximum.accumulate(np.where(valid, pos, -1), axis=0)
+    nxt = np.minimum.accumulate(np.where(valid, pos, n)[::-1], axis=0)[::-1]
+    has_prev = prev >= block_start
+    has_next = nxt <= block_end
 
-    for year in sorted(s.index.year.unique()):
-        ydf = s[s.index.year == year]
-        monthly = ydf[variables].resample("ME").median()
-        monthly.index = monthly.index.month
-        daily_year = monthly_to_daily_for_year(monthly, year)
-        daily_chunks.append(daily_year)
+    cols = np.arange(values.shape[1])[None, :]
+    prev_c, next_c = np.clip(prev, 0, n - 1), np.clip(nxt, 0, n - 1)
+    v_prev, v_next = values[prev_c, cols], values[next_c, cols]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        w = (pos - prev_c) / (next_c - prev_c)
+        interp = v_prev + w * (v_next - v_prev)
 
-    if not daily_chunks:
+    out = np.where(has_prev & has_next, interp, np.where(has_prev, v_prev, np.nan))
+    return np.where(valid, values, out)
+
+
+def monthly_medians_to_daily_all_years(station_df: pd.DataFrame, variables: List[str], date_col="date") -> pd.DataFrame:
+    """
+    Compute monthly medians per year and interpolate to daily values.
+    Medians sit on the middle of each month; Jan 1 and Dec 31 are seeded with the
+    mean of that year's Jan/Dec medians, and negatives are clamped to 0.
+    Done for all years at once; interpolation never crosses a year boundary.
+    """
+    s = station_df[[date_col] + list(variables)].copy()
+    s[date_col] = ensure_datetime(s[date_col])
+    s = s.dropna(subset=[date_col])
+    if s.empty:
         return pd.DataFrame(index=pd.DatetimeIndex([], name=date_col))
 
-    daily = pd.concat(daily_chunks)
-    daily = daily.rename(columns=lambda c: f"{c}_monthly_interp")
-    daily.index.name = date_col
+    dt = s[date_col].dt
+    monthly = s[variables].groupby([dt.year.rename("year"), dt.month.rename("month")]).median()
+    ym = monthly.index.to_frame(index=False)
+
+    # anchor each median on the ~15th (next month start - 17 days)
+    month_start = pd.to_datetime(pd.DataFrame({"year": ym["year"], "month": ym["month"], "day": 1}))
+    anchors = pd.DatetimeIndex(month_start + pd.offsets.MonthBegin(1) - pd.Timedelta("17D"))
+
+    years = np.sort(ym["year"].unique())
+    daily_idx = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(f"{y}-01-01", f"{y}-12-31").values for y in years
+    ]), name=date_col)
+
+    med = monthly.to_numpy(dtype=float)
+    vals = np.full((len(daily_idx), len(variables)), np.nan)
+    vals[daily_idx.get_indexer(anchors)] = med
+
+    # guardrails: seed ends using mid-month (NaN if Jan or Dec is missing)
+    jan = pd.DataFrame(med[(ym["month"] == 1).to_numpy()], index=ym.loc[ym["month"] == 1, "year"]).reindex(years)
+    dec = pd.DataFrame(med[(ym["month"] == 12).to_numpy()], index=ym.loc[ym["month"] == 12, "year"]).reindex(years)
+    end_val = ((jan - dec) / 2 + dec).to_numpy()
+    vals[daily_idx.get_indexer(pd.to_datetime([f"{y}-01-01" for y in years]))] = end_val
+    vals[daily_idx.get_indexer(pd.to_datetime([f"{y}-12-31" for y in years]))] = end_val
+
+    vals = _interpolate_within_blocks(vals, daily_idx.year.to_numpy())
+    np.maximum(vals, 0, out=vals, where=~np.isnan(vals))
+
+    daily = pd.DataFrame(vals, index=daily_idx, columns=[f"{c}_monthly_interp" for c in variables])
     return daily.reset_index()
 
 
@@ -297,70 +461,83 @@ def monthwise_loglog_regressions(
     min_points: int = 5,
     bias_correct: bool = True,
 ) -> pd.DataFrame:
-    """Fit per-month log–log regressions of var vs discharge and predict daily values."""
+    """
+    Fit per-month log–log regressions of var vs discharge and predict daily values.
+    All 12 monthly OLS fits of a variable are solved at once from bincount sums.
+    Returns one row per date with a {var}_monthly_regres column per variable.
+    """
 
-    s = station_df.copy()
-    s[date_col] = pd.to_datetime(s[date_col])
+    s = station_df.copy(deep=False)
+    s[date_col] = ensure_datetime(s[date_col])
     s = s.drop_duplicates(subset=[date_col]).sort_values(date_col)
 
-    out_all = []
+    if discharge_col not in s.columns:
+        return pd.DataFrame(columns=station_df.columns)
 
-    for var in variables:
-        if var not in s.columns or discharge_col not in s.columns:
-            continue
+    month = s[date_col].dt.month.to_numpy()
+    q = s[discharge_col].to_numpy(dtype=float)
+    q_ok = q > 0  # False for NaN too
+    log_q = np.log10(np.where(q_ok, q, np.nan))
 
-        sub = s[[date_col, "river_name", discharge_col, var]].copy().set_index(date_col)
+    preds: Dict[str, np.ndarray] = {}
+    rows = np.zeros(len(s), dtype=bool)  # dates covered by at least one monthly fit
 
-        obs = sub[var].dropna()
-        if obs.empty:
+    for var in variables:
+        if var not in s.columns:
             continue
-        first_date, last_date = obs.index.min(), obs.index.max()
-        sub = sub.loc[first_date:last_date].copy()
-
-        sub["month"] = sub.index.month
-
-        for _, grp in sub.groupby("month"):
-            # training data: need positive values for log
-            train = grp[[discharge_col, var]].dropna().copy()
-            train = train[(train[discharge_col] > 0) & (train[var] > 0)]
-            if train.shape[0] < min_points:
-                continue
-
-            train["log_q"] = np.log10(train[discharge_col].values)
-            train["log_y"] = np.log10(train[var].values)
-
-            X = train[["log_q"]].values
-            y = train["log_y"].values
-            mdl = LinearRegression().fit(X, y)
 
-            g2 = grp.copy()
-            pred = np.full(shape=(len(g2),), fill_value=np.nan, dtype=float)
-
-            ok = g2[discharge_col].notna() & (g2[discharge_col] > 0)
-            X_all = np.log10(g2.loc[ok, discharge_col].values).reshape(-1, 1)
-            yhat_log = mdl.predict(X_all)
-
-            if bias_correct:
-                # smearing-style correction in log10 space: residuals are in log10 units; convert variance to multiplicative factor.
-                resid = y - mdl.predict(X)
-                sigma2 = float(np.var(resid, ddof=1)) if len(resid) > 1 else 0.0
-                # corr = 10 ** (0.5 * sigma2 * np.log(10) ** 2 / (np.log(10) ** 2))
-                # # The above simplifies to: corr = 10 ** (0.5 * sigma2)
-                # # Keeping it explicit isn't necessary—see simpler line below:
-                corr = 10 ** (0.5 * sigma2)
-            else:
-                corr = 1.0
-
-            pred_vals = (10 ** yhat_log) * corr
-            pred[ok.values] = pred_vals
-
-            g2[f"{var}_monthly_regres"] = pred
-            out_all.append(g2.reset_index())
-
-    if not out_all:
+        v = s[var].to_numpy(dtype=float)
+        obs = np.flatnonzero(~np.isnan(v))
+        if obs.size == 0:
+            continue
+        # restrict to the observed period of this variable
+        span = np.zeros(len(s), dtype=bool)
+        span[obs[0]:obs[-1] + 1] = True
+
+        # training data: need positive values for log
+        train = span & q_ok & (v > 0)
+        m_tr = month[train]
+        x, y = log_q[train], np.log10(v[train])
+
+        n = np.bincount(m_tr, minlength=13).astype(float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            x_mean = np.bincount(m_tr, weights=x, minlength=13) / n
+            y_mean = np.bincount(m_tr, weights=y, minlength=13) / n
+            dx, dy = x - x_mean[m_tr], y - y_mean[m_tr]
+            sxx = np.bincount(m_tr, weights=dx * dx, minlength=13)
+            sxy = np.bincount(m_tr, weights=dx * dy, minlength=13)
+            slope = np.where(sxx > 0, sxy / sxx, 0.0)
+        intercept = y_mean - slope * x_mean
+        fitted = n >= min_points
+
+        if bias_correct:
+            # smearing-style correction in log10 space: residuals are in log10 units; convert variance to multiplicative factor.
+            resid = y - (intercept[m_tr] + slope[m_tr] * x)
+            ss = np.bincount(m_tr, weights=resid * resid, minlength=13)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                sigma2 = np.where(n > 1, ss / (n - 1), 0.0)
+            log_corr = 0.5 * sigma2  # log10 of the multiplicative factor
+        else:
+            log_corr = np.zeros(13)
+
+        # fold the correction into the per-month offset: a single power per day
+        offset = intercept + log_corr
+        pred = np.full(len(s), np.nan)
+        ok = span & fitted[month] & q_ok
+        mo = month[ok]
+        lin = slope[mo] * log_q[ok]
+        lin += offset[mo]
+        pred[ok] = np.power(10.0, lin, out=lin)
+        preds[f"{var}_monthly_regres"] = pred
+        rows |= span & fitted[month]
+
+    if not preds:
         return pd.DataFrame(columns=station_df.columns)
 
-    return pd.concat(out_all, ignore_index=True)
+    out = s.loc[rows, [date_col, "river_name", discharge_col]].reset_index(drop=True)
+    for col, vals in preds.items():
+        out[col] = vals[rows]
+    return out
 
 
 # ------------------------------ plotting ------------------------------
@@ -370,38 +547,30 @@ def plot_qc(
     station: str,
     method_col: str,
     method_label: str,
-    pars_meta_df: pd.DataFrame,
-    unit_par_col="parameter_name",
-    unit_unit_col="unit",
+    unit_map: Mapping[str, Any],
     station_col="river_name",
     date_col="date",
     r2_value: Optional[float] = None,
     save_path: Optional[Path] = None,
+    dpi: int = 200,
 ) -> None:
-    unit = ""
-    if var in set(pars_meta_df[unit_par_col]):
-        unit_val = pars_meta_df.loc[pars_meta_df[unit_par_col] == var, unit_unit_col].values[0]
-        unit = f" ({unit_val})"
-
-    df_s = df[df[station_col] == station].copy()
-    plt.figure(figsize=(12, 5))
-    plt.scatter(df_s[date_col], df_s[var], label="Raw", color="black", alpha=0.7, s=30)
+    unit = f" ({unit_map[var]})" if var in unit_map else ""
+
+    df_s = df[df[station_col] == station]
+    fig, ax = new_figure(save_path=save_path, figsize=(12, 5))
+    ax.scatter(df_s[date_col], df_s[var], label="Raw", color="black", alpha=0.7, s=30)
     if method_col in df_s.columns:
-        plt.plot(df_s[date_col], df_s[method_col], label=f"{method_label}", lw=2)
+        ax.plot(df_s[date_col], df_s[method_col], label=f"{method_label}", lw=2)
     title = f"{var} at {station} – {method_label}"
     if r2_value is not None:
         title += f" (R2={r2_value:.2f})"
-    plt.title(title)
-    plt.xlabel(" ")
-    plt.ylabel(f"{var}{unit}")
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
-    if save_path:
-        plt.savefig(save_path, dpi=300, bbox_inches="tight")
-        plt.close()
-    else:
-        plt.show()
+    ax.set_title(title)
+    ax.set_xlabel(" ")
+    ax.set_ylabel(f"{var}{unit}")
+    ax.legend()
+    ax.grid(True)
+    fig.tight_layout()
+    save_or_show_plot(save_path=save_path, dpi=dpi, fig=fig)
 
 
 # ------------------------------- main --------------------------------
@@ -429,13 +598,20 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
 
     ensure_dirs(figs_all_dir, figs_selected_dir, out_dir)
 
+    # optional on-disk cache for NetCDF loads and GAM fits (disabled when unset)
+    cache_dir = paths.get("cache_dir")
+    memory = Memory(resolve_path(cache_dir) if cache_dir else None, verbose=0)
+
     rename_maps = cfg.get("rename_maps", {})
     wc_rename = rename_maps.get("wc", {})
     q_rename = rename_maps.get("q", {})
 
     # variables & metadata
     chem_variables: List[str] = cfg.get("chem_variables", [])
-    pars_meta_df = pd.DataFrame(cfg.get("pars_metadata", []))
+    # parameter_name -> unit, looked up per variable below (first entry wins)
+    unit_map: Dict[str, Any] = {}
+    for row in cfg.get("pars_metadata", []):
+        unit_map.setdefault(row["parameter_name"], row.get("unit"))
     standard_name_map: Dict[str, str] = cfg.get("standard_name_map", {})
 
     # interpolation
@@ -465,8 +641,10 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
     if not q_file.exists():
         raise FileNotFoundError(f"Discharge file not found: {q_file}")
 
-    wc_df_raw = netcdf_to_dataframe(wc_file, time_vars=(wc_time_col, "time", "sample_date"))
-    q_df_raw = netcdf_to_dataframe(q_file, time_vars=(q_time_col, "time", "date"))
+    wc_df_raw = load_netcdf_cached(memory, wc_file, time_vars=(wc_time_col, "time", "sample_date"))
+    q_df_raw = load_netcdf_cached(
+        memory, q_file, time_vars=(q_time_col, "time", "date"), variables=[discharge_var, q_station_col]
+    )
 
     # station id we will work with
     station_name_val = read_meta_value(wc_df_raw, meta_map, "station_name")
@@ -505,6 +683,8 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
         discharge_col="discharge",
         drop_wc_cols=cfg.get("drop_columns", ['latitude', 'longitude', 'station_id', 'station_code', 'station_type']),
     )
+    # day-of-year for the GAMs, computed once (1-366 fits in int16)
+    merged["doy"] = merged["date"].dt.dayofyear.astype(np.int16)
 
     # run interpolation
     # 1) linear (gap-limited)
@@ -527,6 +707,9 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
         station_name=station_id,
         n_splines_xy=tuple(gam_cfg.get("n_splines_xy", [10, 20])),
         lam_grid=np.array(gam_cfg["lam_grid"]) if gam_cfg.get("lam_grid") else None,
+        n_jobs=int(gam_cfg.get("n_jobs", 1)),
+        var_n_jobs=int(gam_cfg.get("var_n_jobs", 1)),
+        memory=memory,
     )
 
     # 3) monthwise log–log(Q, var)
@@ -539,57 +722,47 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
         merged, chem_variables, date_col="date"
     )
 
-    # attach monthly_interp to the station frame so we carry river_name + discharge for consistent joins
-    st_plus_month = (
-        merged.set_index("date")
-        .merge(df_month_interp.set_index("date"), left_index=True, right_index=True, how="left")
-        .reset_index()
-    )
-
     # combine method outputs
-    # A <- linear + GAM
-    merged1 = pd.merge(
-        df_linear, df_gam,
-        on=["river_name", "date", "discharge"],
-        how="left", suffixes=("", "_drop")
-    )
-    merged1 = merged1.loc[:, ~merged1.columns.str.endswith("_drop")]
-
-    # B <- A + monthwise log–log regression
-    merged2 = pd.merge(
-        merged1, df_month_reg,
-        on=["river_name", "date", "discharge"],
-        how="left", suffixes=("", "_drop")
-    )
-    merged2 = merged2.loc[:, ~merged2.columns.str.endswith("_drop")]
-
-    # C <- B + monthly medians
-    merged3 = pd.merge(
-        merged2, st_plus_month,
-        on=["river_name", "date", "discharge"],
-        how="left", suffixes=("", "_drop")
-    )
-    merged3 = merged3.loc[:, ~merged3.columns.str.endswith("_drop")]
-
-    # group and aggregate daily values
-    df_grouped = (
-        merged3.groupby(["date", "river_name"])
-        .agg(lambda x: x.mean() if pd.api.types.is_numeric_dtype(x) else x.iloc[0])
-        .reset_index()
-    )
+    # every frame is one row per date for this station, so align on the date
+    # index and append only the columns the linear frame does not already have
+    combined = df_linear.set_index("date")
+    extras = []
+    for df_method in (df_gam, df_month_reg, df_month_interp):
+        df_method = df_method.set_index("date")
+        new_cols = [c for c in df_method.columns if c not in combined.columns]
+        extras.append(df_method[new_cols].reindex(combined.index))
+    df_grouped = pd.concat([combined, *extras], axis=1).reset_index()
 
     # resample to daily per station
-    df_daily_all = (
-        df_grouped.set_index("date")
-        .groupby("river_name")
-        .resample("D")
-        .mean(numeric_only=True)
-        .reset_index()
-        .sort_values(["river_name", "date"])
-    )
+    num_cols = list(df_grouped.select_dtypes("number").columns)
+    if df_grouped["river_name"].nunique() == 1:
+        # dates are already unique for a single station; only fill the calendar
+        df_daily_all = (
+            df_grouped.set_index("date")[num_cols]
+            .sort_index()
+            .asfreq("D")
+            .reset_index()
+        )
+        df_daily_all.insert(
+            0, "river_name", pd.Categorical.from_codes(np.zeros(len(df_daily_all), dtype=np.int8), [station_id])
+        )
+    else:
+        df_daily_all = (
+            df_grouped.set_index("date")
+            .groupby("river_name", observed=True)[num_cols]
+            .resample("D")
+            .mean()
+            .reset_index()
+            .sort_values(["river_name", "date"])
+        )
 
     # copy for plotting/selection
-    df_sel = df_daily_all.copy()
+    df_sel = df_daily_all.copy(deep=False)
+    # per-station frames, split once (read-only; *_final columns go to df_daily_all)
+    station_frames = {k: g for k, g in df_sel.groupby("river_name", sort=False, observed=True)}
+    no_rows = df_sel.iloc[0:0]
+    station_mask = (df_daily_all["river_name"] == station_id).to_numpy()
+    station_dates = pd.DatetimeIndex(df_daily_all.loc[station_mask, "date"].values)
 
     # method selection per variable
     methods_chosen: Dict[str, Any] = {}
@@ -599,7 +772,7 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
         method_scores[var] = {}
         methods_chosen[var] = {}
 
-        df_station = df_daily_all[df_daily_all["river_name"] == station_id].copy()
+        df_station = station_frames.get(station_id, no_rows)
         if df_station.empty or var not in df_station.columns:
             print(f"{station_id} -> {var}: No data column, skipping.")
             continue
@@ -613,6 +786,16 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
 
         df_obs_range = df_station.loc[obs_start:obs_end]
         y_obs = df_obs_range[var]
+        y_obs_np = y_obs.to_numpy(dtype=np.float64)
+        obs_mask = ~np.isnan(y_obs_np)
+        r2_cache: Dict[str, Optional[float]] = {}
+
+        def score(colname: str) -> Optional[float]:
+            """R^2 of colname against the observations (None if < 10 overlapping days)."""
+            if colname not in r2_cache:
+                r2_cache[colname] = _r2_on_overlap(y_obs_np, obs_mask, df_obs_range[colname].to_numpy(dtype=np.float64))
+            return r2_cache[colname]
+
         good_methods = []
 
         # evaluate candidates
@@ -621,10 +804,9 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
             if colname not in df_station.columns:
                 continue
             y_pred = df_obs_range[colname]
-            valid = y_obs.notna() & y_pred.notna()
-            if valid.sum() < 10:
+            r2 = score(colname)
+            if r2 is None:
                 continue
-            r2 = r2_score(y_obs[valid], y_pred[valid])
             method_scores[var].setdefault(station_id, {})[suffix] = {"R^2": r2}
             if r2 >= r2_threshold:
                 good_methods.append({'suffix': suffix, 'r2': r2, 'colname': colname, 'y_pred': y_pred})
@@ -635,16 +817,15 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
         selected_series: Optional[pd.Series] = None
 
         # outlier check
+        obs = y_obs.dropna()
+        final_threshold = obs.mean() + z_score_limit * obs.std() + tolerance
         for m in good_methods:
             pred = m['y_pred']
-            obs = y_obs.dropna()
-            base_threshold = obs.mean() + z_score_limit * obs.std()
-            final_threshold = base_threshold + tolerance
             if (pred > final_threshold).any():
                 print(f"{station_id} -> {var}: {m['colname']} rejected — {int((pred > final_threshold).sum())} extreme value(s)")
                 continue
             selected_col = m['colname']
-            selected_series = pred.copy()
+            selected_series = pred
             print(f"{station_id} -> {var}: Selected {selected_col} (R^2 = {m['r2']:.3f})")
             break
 
@@ -653,7 +834,7 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
             fallback_col = f"{var}_{fallback_method}"
             if fallback_col in df_obs_range.columns:
                 selected_col = fallback_col
-                selected_series = df_obs_range[fallback_col].copy()
+                selected_series = df_obs_range[fallback_col]
                 print(f"{station_id} -> {var}: Fallback to {fallback_col}")
             else:
                 print(f"{station_id} -> {var}: No valid method available")
@@ -666,8 +847,7 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
 
         if missing_mask.any():
             # check for long gap >= 4y
-            gap_lengths = (missing_mask.astype(int).groupby((~missing_mask).cumsum()).sum())
-            long_gap = (not gap_lengths.empty) and (gap_lengths.max() >= 1460)
+            long_gap = _max_run(missing_mask.to_numpy()) >= 1460
 
             fb_cands = []
             for suffix in ['annual_gam', 'monthly_regres']:
@@ -675,10 +855,9 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
                 if col not in df_obs_range.columns:
                     continue
                 y_pred = df_obs_range[col]
-                valid = y_obs.notna() & y_pred.notna()
-                if valid.sum() < 10:
+                r2b = score(col)
+                if r2b is None:
                     continue
-                r2b = r2_score(y_obs[valid], y_pred[valid])
                 method_scores[var].setdefault(station_id, {})[suffix] = {"R^2": r2b}
 
                 if long_gap:
@@ -709,14 +888,12 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
         }
 
         # write back
-        mask = df_daily_all["river_name"] == station_id
-        dates = pd.DatetimeIndex(df_daily_all.loc[mask, "date"].values)
-        aligned = filled_series.reindex(dates)
-        df_daily_all.loc[mask, f"{var}_final"] = aligned.values
+        aligned = filled_series.reindex(station_dates)
+        df_daily_all.loc[station_mask, f"{var}_final"] = aligned.values
 
         # QC plot
         pred_df = filled_series.rename("pred").reset_index()  # date, pred
-        df_plot = df_sel[df_sel["river_name"] == station_id][["date", "river_name", var]].merge(
+        df_plot = station_frames.get(station_id, no_rows)[["date", "river_name", var]].merge(
             pred_df, on="date", how="left"
         )
 
@@ -745,7 +922,7 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
             station=station_id,
             method_col="pred",
             method_label=method_label,
-            pars_meta_df=pars_meta_df,
+            unit_map=unit_map,
             r2_value=r2_for_label,
             save_path=figs_selected_dir / f"{station_id}_{var}_selected_method.png",
         )
@@ -753,15 +930,14 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
     # overview plots
     stations = [station_id]
     for var in chem_variables:
-        fig, axes = plt.subplots(nrows=1, ncols=len(stations), figsize=(6 * len(stations), 6))
-        if len(stations) == 1:
-            axes = [axes]
-        unit = ""
-        if var in set(pars_meta_df["parameter_name"]):
-            u = pars_meta_df.loc[pars_meta_df["parameter_name"] == var, "unit"].values[0]
-            unit = f" ({u})"
+        overview_path = figs_all_dir / f"{var}_all_interp_methods.png"
+        fig, axes = new_figure(
+            save_path=overview_path, nrows=1, ncols=len(stations), figsize=(6 * len(stations), 6), squeeze=False
+        )
+        axes = axes[0]
+        unit = f" ({unit_map[var]})" if var in unit_map else ""
         for ax, st in zip(axes, stations):
-            d = df_sel[df_sel["river_name"] == st]
+            d = station_frames.get(st, no_rows)
             ax.scatter(d["date"], d[var], label="Raw", s=20, facecolors="white", edgecolors="black", alpha=0.8, zorder=4)
             for label, style, color in [
                 (f"{var}_monthly_interp", "-", None),
@@ -773,20 +949,19 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
                     ax.plot(d["date"], d[label], label=label.replace(f"{var}_", "").replace("_", " ").title(),
                             linestyle=style, color=color, alpha=0.7)
             ax.set_title(st); ax.set_xlabel("date"); ax.set_ylabel(f"{var}{unit}"); ax.legend(); ax.grid(True)
-        plt.tight_layout(rect=[0, 0.03, 1, 0.95])
-        plt.suptitle(f"{var} Raw vs Interpolations", fontsize=16)
-        plt.savefig(figs_all_dir / f"{var}_all_interp_methods.png", dpi=300, bbox_inches="tight")
-        plt.close()
+        fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+        fig.suptitle(f"{var} Raw vs Interpolations", fontsize=16)
+        save_or_show_plot(save_path=overview_path, dpi=300, fig=fig)
 
     # export final
     final_cols = [c for c in df_daily_all.columns if c.endswith("_final")]
-    export = df_daily_all[["date", "river_name"] + final_cols].copy()
+    export = df_daily_all[["date", "river_name"] + final_cols]
     export = export.rename(columns={c: c.replace("_final", "") for c in final_cols})
     export = export.sort_values(["river_name", "date"])
 
     # xarray per station
     df_station = export[export["river_name"] == station_id].copy()
-    df_station["date"] = pd.to_datetime(df_station["date"])
+    df_station["date"] = ensure_datetime(df_station["date"])
     df_station = df_station.set_index("date")
     ds = xr.Dataset.from_dataframe(df_station.drop(columns=["river_name"]))
 
@@ -820,9 +995,8 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
     for var in ds.data_vars:
         if var == "river_name":
             continue
-        if var in set(pars_meta_df["parameter_name"]):
-            row = pars_meta_df[pars_meta_df["parameter_name"] == var].iloc[0]
-            ds[var].attrs["units"] = str(row["unit"])
+        if var in unit_map:
+            ds[var].attrs["units"] = str(unit_map[var])
             ds[var].attrs["long_name"] = str(standard_name_map.get(var, var))
 
         # method comment
@@ -881,6 +1055,7 @@ def interpolate(cfg: Dict[str, Any]) -> List[Path]:
         nc_format=nc_format,
         time_encoding_cfg=time_enc_cfg,
         var_encoding_overrides=None,
+        data_var_encoding=export_cfg.get("data_vars"),
     )
 
     return [out_path]
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import ast
 import uuid
 import math
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
@@ -9,8 +11,11 @@ import numpy as np
 import pandas as pd
 import xarray as xr
 import matplotlib.pyplot as plt
+from matplotlib.colors import to_rgba
+from matplotlib.lines import Line2D
 
 from src.export_netcdf import export_dataset
+from src.utils import dataset_to_dataframe, ensure_datetime, new_figure
 
 plt.style.use("ggplot")
 
@@ -43,6 +48,28 @@ def read_meta_value(df: pd.DataFrame, m: Dict[str, Any], key: str) -> Optional[A
         return spec["value"]
     return None
 
+def read_meta_values(df: pd.DataFrame, m: Dict[str, Any], keys: List[str]) -> Dict[str, Optional[Any]]:
+    """read_meta_value for several keys, with one bfill over all from_col columns."""
+    cols: List[str] = []
+    for key in keys:
+        spec = m.get(key)
+        if spec and "from_col" in spec:
+            if spec["from_col"] not in df.columns:
+                raise KeyError(f"meta.{key}.from_col='{spec['from_col']}' not found.")
+            if spec["from_col"] not in cols:
+                cols.append(spec["from_col"])
+    first = df[cols].bfill().iloc[0] if cols and len(df) else pd.Series(index=cols, dtype=object)
+
+    out: Dict[str, Optional[Any]] = {}
+    for key in keys:
+        spec = m.get(key)
+        if spec and "from_col" in spec:
+            val = first[spec["from_col"]]
+            out[key] = None if pd.isna(val) else val
+        else:
+            out[key] = read_meta_value(df, m, key)
+    return out
+
 def ensure_one_station_if_possible(df: pd.DataFrame, m: Dict[str, Any], fname: str) -> None:
     """If station_id comes from a column, enforce one station per file."""
     spec = m.get("station_id")
@@ -55,27 +82,47 @@ def ensure_one_station_if_possible(df: pd.DataFrame, m: Dict[str, Any], fname: s
     if len(uniq) != 1:
         raise ValueError(f"Expected 1 station per file; found {len(uniq)} in {fname}: {uniq}")
 
+# globals for config expressions: column names only, no builtins
+EXPR_GLOBALS: Dict[str, Any] = {"__builtins__": {}}
+
+@lru_cache(maxsize=None)
+def compile_expr(src: str):
+    """Compile a config formula/condition once; evaluated with column Series as locals."""
+    return compile(src, "<config expr>", "eval")
+
+@lru_cache(maxsize=None)
+def expr_names(src: str) -> frozenset:
+    """Bare names referenced by a config formula/condition (the columns it needs)."""
+    return frozenset(n.id for n in ast.walk(ast.parse(src, mode="eval")) if isinstance(n, ast.Name))
+
 # --------------------------- plotting ---------------------------
 def plot_reconstruction(df: pd.DataFrame, date_col: str, var_orig: str, var_final: str,
                         label_base: str = "", station_label: str = "", units: str = "",
                         output_path: Path | None = None,
-                        colors: Dict[str, str] | None = None) -> None:
+                        colors: Dict[str, str] | None = None,
+                        ax=None, dpi: int = 300) -> None:
+    """Original vs reconstructed series; pass ax to redraw into a reused figure."""
     colors = colors or {'original': '#1b9e77', 'final': '#d95f02'}
     if var_orig not in df.columns or var_final not in df.columns:
         return
-    plt.figure(figsize=(10, 4))
-    plt.plot(df[date_col], df[var_orig], label=f'{label_base} (original)',
-             color=colors['original'], marker='o', linestyle='none')
-    plt.plot(df[date_col], df[var_final], label=f'{label_base} (reconstructed)',
-             color=colors['final'], marker='.', linestyle='-', alpha=0.7)
-    plt.title(f"{station_label}")
-    plt.ylabel(f"{label_base} ({units})" if units else label_base)
-    plt.grid(True)
-    plt.legend()
-    plt.tight_layout()
+    owns_fig = ax is None
+    if owns_fig:
+        _, ax = plt.subplots(figsize=(10, 4))
+    else:
+        ax.clear()
+    ax.plot(df[date_col], df[var_orig], label=f'{label_base} (original)',
+            color=colors['original'], marker='o', linestyle='none')
+    ax.plot(df[date_col], df[var_final], label=f'{label_base} (reconstructed)',
+            color=colors['final'], marker='.', linestyle='-', alpha=0.7)
+    ax.set_title(f"{station_label}")
+    ax.set_ylabel(f"{label_base} ({units})" if units else label_base)
+    ax.grid(True)
+    ax.legend()
+    ax.figure.tight_layout()
     if output_path:
-        plt.savefig(output_path, dpi=300, bbox_inches="tight")
-        plt.close()
+        ax.figure.savefig(output_path, dpi=dpi, bbox_inches="tight")
+        if owns_fig:
+            plt.close(ax.figure)
     else:
         plt.show()
 
@@ -106,10 +153,12 @@ def detect_outliers(df: pd.DataFrame, station_name: str, filename: str,
                                 meta_map: Dict[str, Any],
                                 variables: List[str] | None = None,
                                 out_cfg: Dict[str, Any] | None = None,
-                                fig_dir: Path | None = None) -> pd.DataFrame:
+                                fig_dir: Path | None = None,
+                                dpi: int = 300) -> pd.DataFrame:
     """Replace quantile-based outliers with NaN and optionally write a QC figure."""
 
-    df = df.copy()
+    # shallow copy: flagged columns are replaced below, the caller's frame is not written to
+    df = df.copy(deep=False)
 
     # quantile thresholds from config
     out_cfg = out_cfg or {"lower_quantile": 0.05, "upper_quantile": 0.95}
@@ -121,38 +170,52 @@ def detect_outliers(df: pd.DataFrame, station_name: str, filename: str,
             spec = meta_map.get(k)
             if spec and "from_col" in spec and spec["from_col"] in df.columns:
                 exclude.add(spec["from_col"])
-        variables = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c]) and c not in exclude]
+        # one dtype dispatch for all columns; keeps the frame's column order (plot layout)
+        variables = [c for c in df.select_dtypes(include=["number", "bool"]).columns if c not in exclude]
 
-    variables = [v for v in variables if v in df.columns and not df[v].dropna().empty]
+    variables = [v for v in variables if v in df.columns]
+    has_data = df[variables].notna().any()
+    variables = has_data.index[has_data.to_numpy()].tolist()
     if not variables:
         return df
 
+    # thresholds and outlier flags for all variables at once (NaN-skipping, linear like Series.quantile)
+    vals = df[variables].to_numpy(dtype=np.float64)
+    p_low, p_high = np.nanquantile(vals, [q_low, q_high], axis=0)
+    outlier_mask = (vals < p_low) | (vals > p_high)
+
     ncols, nrows = 2, math.ceil(len(variables) / 2)
     fig, axs = plt.subplots(nrows=nrows, ncols=ncols, figsize=(14, 4 * nrows), squeeze=False)
     fig.suptitle(f"{station_name} – Outlier Detection (Q{q_low*100:.2f}–Q{q_high*100:.2f})", fontsize=16)
 
+    # one scatter per panel: per-point colours, outliers drawn last (on top)
+    dates = df[date_col].to_numpy()
+    colours = np.array([to_rgba("gray", 0.7), to_rgba("red")])
     for idx, var in enumerate(variables):
         row, col = divmod(idx, ncols)
         ax = axs[row][col]
-        series = df[var].dropna()
-        p_low = series.quantile(q_low)
-        p_high = series.quantile(q_high)
-        outliers = (df[var] < p_low) | (df[var] > p_high)
-        ax.scatter(df[date_col], df[var], label=var, color='gray', alpha=0.7)
-        ax.scatter(df.loc[outliers, date_col], df.loc[outliers, var], color='red', label='Outliers')
-        ax.set_title(var); ax.set_xlabel("Date"); ax.set_ylabel(var); ax.legend(); ax.grid(True)
-        df.loc[outliers, var] = np.nan
+        outliers = outlier_mask[:, idx]
+        valid = ~np.isnan(vals[:, idx])
+        order = np.flatnonzero(valid)[np.argsort(outliers[valid], kind="stable")]
+        ax.scatter(dates[order], vals[order, idx], c=colours[outliers[order].astype(np.intp)])
+        handles = [Line2D([], [], ls="", marker="o", color=colours[0], label=var),
+                   Line2D([], [], ls="", marker="o", color=colours[1], label="Outliers")]
+        ax.set_title(var); ax.set_xlabel("Date"); ax.set_ylabel(var); ax.legend(handles=handles); ax.grid(True)
 
     for i in range(len(variables), nrows * ncols):
         row, col = divmod(i, ncols)
         axs[row][col].axis('off')
 
+    for idx, var in enumerate(variables):
+        if outlier_mask[:, idx].any():
+            df[var] = df[var].mask(outlier_mask[:, idx])
+
     if fig_dir:
         fig_dir.mkdir(parents=True, exist_ok=True)
         base_name = Path(filename).stem
         out_png = fig_dir / f"{base_name}_detected_outliers.png"
         plt.tight_layout(rect=[0, 0.03, 1, 0.95])
-        plt.savefig(out_png, dpi=300, bbox_inches='tight')
+        plt.savefig(out_png, dpi=dpi, bbox_inches='tight')
         plt.close()
     else:
         plt.show()
@@ -194,7 +257,10 @@ def preprocess(cfg: Dict[str, Any]) -> List[Path]:
     derivation_config: List[Dict[str, Any]] = cfg["derivation_config"]
     plot_config: List[Dict[str, Any]] = cfg["plot_config"]
     outlier_config: Dict[str, Any] = cfg["outlier_config"]
-    pars_meta_df = pd.DataFrame(cfg.get("pars_metadata", []))
+    # parameter_name -> metadata row, looked up per variable below (first entry wins)
+    pars_meta: Dict[str, Dict[str, Any]] = {}
+    for row in cfg.get("pars_metadata", []):
+        pars_meta.setdefault(row["parameter_name"], row)
     standard_name_map: Dict[str, str] = cfg.get("standard_name_map", {})
     var_comments: Dict[str, str] = cfg.get("var_comments", {})
     global_metadata_config: Dict[str, Any] = cfg["global_metadata_config"]  # may include fixed date_created
@@ -206,10 +272,10 @@ def preprocess(cfg: Dict[str, Any]) -> List[Path]:
 
     # load file
     with xr.open_dataset(in_file) as ds_in:
-        df = ds_in.to_dataframe().reset_index()
+        df = dataset_to_dataframe(ds_in, time_vars=())
 
     tcol = autodetect_time_col(df, explicit_time)
-    df[tcol] = pd.to_datetime(df[tcol], errors="coerce")
+    df[tcol] = ensure_datetime(df[tcol], errors="coerce")
     ensure_one_station_if_possible(df, meta_map, in_file.name)
 
     # reconstruction + per-var plots
@@ -221,6 +287,8 @@ def preprocess(cfg: Dict[str, Any]) -> List[Path]:
             station_name_val = svals[0] if len(svals) else None
     station_label = str(station_name_val) if station_name_val is not None else in_file.name
 
+    # one figure, redrawn for every reconstructed variable
+    fig_recon, ax_recon = new_figure(save_path=fig_dir, figsize=(10, 4))
     tmp_cols: List[str] = []
     for var, settings in reconstruction_config.items():
         fallback     = settings.get("fallback")
@@ -233,66 +301,89 @@ def preprocess(cfg: Dict[str, Any]) -> List[Path]:
         if var in df.columns:
             df[preserve_as] = df[var]
 
+        fill_sources: List[np.ndarray] = []
         if var in df.columns and fallback and (fallback in df.columns):
-            df[var] = df[var].fillna(df[fallback])
+            fill_sources.append(df[fallback].to_numpy(dtype=np.float64))
             tmp_cols.append(fallback)
 
+        calc = None
         if compute_from and (compute_from in df.columns) and formula:
-            df[calc_temp] = eval(formula, {}, {compute_from: df[compute_from]})
-            df[var] = df[var].fillna(df[calc_temp]) if var in df.columns else df[calc_temp]
+            calc = eval(compile_expr(formula), EXPR_GLOBALS, {compute_from: df[compute_from]})
+            if var in df.columns:
+                fill_sources.append(np.asarray(calc, dtype=np.float64))
             tmp_cols.extend([compute_from, calc_temp])
 
+        if fill_sources:
+            # fallback first, then the computed values, filled into one array
+            arr = df[var].to_numpy(dtype=np.float64, copy=True)
+            for src in fill_sources:
+                gaps = np.isnan(arr)
+                arr[gaps] = src[gaps]
+            df[var] = arr
+        elif calc is not None:
+            df[var] = calc
+
         if preserve_as in df.columns and var in df.columns:
             out_png = fig_dir / f"{in_file.stem}_{var}_reconstruction.png"
             plot_reconstruction(df, tcol, preserve_as, var,
                                 label_base=var, station_label=str(station_label),
-                                units=units, output_path=out_png)
+                                units=units, output_path=out_png, ax=ax_recon, dpi=150)
         tmp_cols.append(preserve_as)
+    fig_recon.clear()
 
     df = df.drop(columns=[c for c in tmp_cols if c in df.columns])
 
     # derivations + masks + summary figure
+    date_arrays: Dict[str, np.ndarray] = {}  # datetime64 values per mask_date_before column
+    cols = set(df.columns)  # refreshed below whenever a rule adds a column
     for rule in derivation_config:
         op = rule["operation"]; target = rule.get("target")
 
-        if op == "scale" and target in df.columns:
+        if op == "scale" and target in cols:
             df[target] = df[target] * rule["factor"]
 
         elif op == "sum":
             sources = rule["sources"]
-            if all(col in df.columns for col in sources):
+            if cols.issuperset(sources):
                 df[target] = df[sources[0]] + df[sources[1]]
+                cols.add(target)
 
         elif op == "fill_from_other":
-            if all(col in df.columns for col in rule["requires"]):
-                ctx = {col: df[col] for col in df.columns}
-                cond = eval(rule["condition"], {}, ctx)
-                df.loc[cond, target] = eval(rule["expression"], {}, ctx)
+            if cols.issuperset(rule["requires"]):
+                names = expr_names(rule["condition"]) | expr_names(rule["expression"])
+                ctx = {col: df[col] for col in names if col in cols}
+                cond = eval(compile_expr(rule["condition"]), EXPR_GLOBALS, ctx)
+                df.loc[cond, target] = eval(compile_expr(rule["expression"]), EXPR_GLOBALS, ctx)
+                cols.add(target)
 
         elif op == "rowwise_sum":
             sources = rule["sources"]
-            if all(col in df.columns for col in sources):
-                df[target] = df.apply(
-                    lambda row: sum(row[col] for col in sources) if all(pd.notna(row[col]) for col in sources) else np.nan,
-                    axis=1
-                )
+            if cols.issuperset(sources):
+                # NaN unless every source is present
+                df[target] = df[sources].sum(axis=1, skipna=False)
+                cols.add(target)
 
         elif op == "difference":
-            if all(col in df.columns for col in rule["requires"]):
+            if cols.issuperset(rule["requires"]):
                 a, b = rule["requires"]
                 df[target] = df[a] - df[b]
+                cols.add(target)
 
         elif op == "mask_date_before":
+            if rule.get("file_contains", "") not in in_file.name:
+                continue
             date_column = rule.get("date_column", tcol)
-            if (rule.get("file_contains","") in in_file.name) and (target in df.columns) and (date_column in df.columns):
-                mask = pd.to_datetime(df[date_column]) < pd.Timestamp(rule["before"])
+            if (target in cols) and (date_column in cols):
+                if date_column not in date_arrays:
+                    date_arrays[date_column] = ensure_datetime(df[date_column]).to_numpy()
+                mask = date_arrays[date_column] < np.datetime64(pd.Timestamp(rule["before"]))
                 df.loc[mask, target] = np.nan
 
     fig, axs = plt.subplots(3, 2, figsize=(14, 16))
     fig.suptitle(f"Station: {station_label}", fontsize=16)
     plotted = False
     for pc in plot_config:
-        if not all(col in df.columns for col in pc["required"]):
+        if not cols.issuperset(pc["required"]):
             continue
         r, c = pc["subplot"]; plotted = True
         if pc["type"] == "scatter":
@@ -311,21 +402,22 @@ def preprocess(cfg: Dict[str, Any]) -> List[Path]:
     # outlier pass
     df = detect_outliers(df, station_label, in_file.name,
                                      date_col=tcol, meta_map=meta_map,
-                                     out_cfg=outlier_config, fig_dir=fig_dir)
+                                     out_cfg=outlier_config, fig_dir=fig_dir, dpi=150)
 
     # build dataset + write
-    df = df.copy()
-    df[tcol] = pd.to_datetime(df[tcol])
+    df[tcol] = ensure_datetime(df[tcol])
 
     df = df.set_index(tcol)
     df.index.name = time_name
 
-    lat = read_meta_value(df, meta_map, "latitude")
-    lon = read_meta_value(df, meta_map, "longitude")
-    station_id = read_meta_value(df, meta_map, "station_id")
-    station_code = read_meta_value(df, meta_map, "station_code")
-    station_name = read_meta_value(df, meta_map, "station_name")
-    station_type = read_meta_value(df, meta_map, "station_type")
+    meta_vals = read_meta_values(
+        df, meta_map, ["latitude", "longitude", "station_id", "station_code", "station_name", "station_type"]
+    )
+    lat, lon = meta_vals["latitude"], meta_vals["longitude"]
+    station_id = meta_vals["station_id"]
+    station_code = meta_vals["station_code"]
+    station_name = meta_vals["station_name"]
+    station_type = meta_vals["station_type"]
 
     # drop any meta columns before building dataset
     drop_cols = []
@@ -335,9 +427,11 @@ def preprocess(cfg: Dict[str, Any]) -> List[Path]:
             drop_cols.append(spec["from_col"])
     df_clean = df.drop(columns=drop_cols, errors="ignore")
 
-    ds_out = xr.Dataset.from_dataframe(df_clean)
-
-    ds_out = ds_out.assign_coords(**{time_name: (time_name, df.index)})
+    # columns are already 1-D along time: wrap the arrays instead of from_dataframe()
+    ds_out = xr.Dataset(
+        {c: (time_name, df_clean[c].to_numpy()) for c in df_clean.columns},
+        coords={time_name: (time_name, df.index)},
+    )
 
     if lat is not None and lon is not None:
         ds_out = ds_out.assign_coords(
@@ -389,13 +483,11 @@ def preprocess(cfg: Dict[str, Any]) -> List[Path]:
     for var in ds_out.data_vars:
         if var in ["station_id", "station_code", "station_name", "station_type"]:
             continue
-        if not pars_meta_df.empty:
-            match = pars_meta_df[pars_meta_df["parameter_name"] == var]
-            if not match.empty:
-                row = match.iloc[0]
-                ds_out[var].attrs["units"] = str(row["unit"])
-                ds_out[var].attrs["parameter_name"] = str(row["parameter_name"])
-                ds_out[var].attrs["long_name"] = str(standard_name_map.get(var, row["parameter_name"]))
+        row = pars_meta.get(var)
+        if row is not None:
+            ds_out[var].attrs["units"] = str(row["unit"])
+            ds_out[var].attrs["parameter_name"] = str(row["parameter_name"])
+            ds_out[var].attrs["long_name"] = str(standard_name_map.get(var, row["parameter_name"]))
         if var in var_comments:
             ds_out[var].attrs["comment"] = str(var_comments[var])
 
@@ -436,6 +528,7 @@ def preprocess(cfg: Dict[str, Any]) -> List[Path]:
         nc_format=nc_format,
         time_encoding_cfg=time_enc_cfg,
         var_encoding_overrides=enc_overrides,
+        data_var_encoding=export_cfg.get("data_vars"),
     )
 
     return [out_path]
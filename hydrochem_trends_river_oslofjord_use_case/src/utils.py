@@ -23,6 +23,7 @@ import json
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Sequence
 
+import numpy as np
 import pandas as pd
 import xarray as xr
 
@@ -69,25 +70,57 @@ def expand_globs(root: str | Path, pattern: str) -> List[Path]:
 
 # ---------------------------- netcdf / io ----------------------------
 
-def netcdf_to_dataframe(
-    nc_path: str | Path,
+def ensure_datetime(values, errors: str = "raise"):
+    """pd.to_datetime(values, cache=True), skipped when values already hold datetimes."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return pd.to_datetime(values, errors=errors, cache=True)
+
+
+def dataset_to_dataframe(
+    ds: xr.Dataset,
     *,
     time_vars: Iterable[str] = ("time", "date", "sample_date", "datetime", "timestamp"),
+    variables: Optional[Sequence[str]] = None,
 ) -> pd.DataFrame:
     """
-    Open NetCDF with xarray and return a flat DataFrame.
+    Flatten an already opened dataset to a DataFrame.
+    If variables is given, only those (plus coords) are read into the frame.
     Also coerces any time-like columns listed in time_vars to datetime.
     """
-    nc_path = Path(nc_path)
-    with xr.open_dataset(nc_path) as ds:
+    if variables is not None:
+        ds = ds[[v for v in variables if v in ds.data_vars]]
+
+    dims = list(ds.sizes)
+    if len(dims) == 1 and dims[0] in ds.variables:
+        # single time series: take the columns straight from the arrays
+        # (scalars broadcast) instead of building to_dataframe()'s index
+        dim, n = dims[0], ds.sizes[dims[0]]
+        cols = {dim: ds[dim].values}
+        for name, var in ds.variables.items():
+            if name != dim:
+                cols[name] = var.values if var.ndim else np.repeat(var.values, n)
+        df = pd.DataFrame(cols)
+    else:
         df = ds.to_dataframe().reset_index()
 
     for t in time_vars:
-        if t in df.columns:
-            df[t] = pd.to_datetime(df[t], errors="coerce")
+        if t in df.columns and not pd.api.types.is_datetime64_any_dtype(df[t]):
+            df[t] = ensure_datetime(df[t], errors="coerce")
     return df
 
 
+def netcdf_to_dataframe(
+    nc_path: str | Path,
+    *,
+    time_vars: Iterable[str] = ("time", "date", "sample_date", "datetime", "timestamp"),
+    variables: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """ Open NetCDF with xarray and return a flat DataFrame (see dataset_to_dataframe). """
+    with xr.open_dataset(Path(nc_path)) as ds:
+        return dataset_to_dataframe(ds, time_vars=time_vars, variables=variables)
+
+
 # ---------------------------- dataframe harmonization ----------------------------
 
 def standardize_time_and_station(
@@ -105,28 +138,67 @@ def standardize_time_and_station(
     - parse date as datetime
     - optionally normalize (set time to 00:00)
     - rename station_col_in -> station_col_out and apply rename map
+    - store the station column as a categorical (int codes for filters/groupbys)
     """
-    out = df.copy()
+    # shallow copy: columns are only replaced, never written in place
+    out = df.copy(deep=False)
 
     if time_col_in in out.columns and time_col_in != date_col_out:
-        out = out.rename(columns={time_col_in: date_col_out})
+        out = out.rename(columns={time_col_in: date_col_out}, copy=False)
 
     if date_col_out in out.columns:
-        out[date_col_out] = pd.to_datetime(out[date_col_out], errors="coerce")
+        if not pd.api.types.is_datetime64_any_dtype(out[date_col_out]):
+            out[date_col_out] = ensure_datetime(out[date_col_out], errors="coerce")
         if normalize_date:
-            out[date_col_out] = out[date_col_out].dt.normalize()
+            dates = out[date_col_out]
+            if isinstance(dates.dtype, pd.DatetimeTZDtype):
+                out[date_col_out] = dates.dt.normalize()
+            else:
+                # truncate to whole days in one pass, keeping the original resolution
+                out[date_col_out] = dates.to_numpy().astype("datetime64[D]").astype(dates.dtype)
 
     if station_col_in in out.columns:
         if station_rename_map:
-            out[station_col_in] = out[station_col_in].replace(station_rename_map)
+            # dict lookup via map; unmapped names keep their original value
+            names = out[station_col_in]
+            out[station_col_in] = names.map(station_rename_map).fillna(names)
         if station_col_in != station_col_out:
-            out = out.rename(columns={station_col_in: station_col_out})
+            out = out.rename(columns={station_col_in: station_col_out}, copy=False)
+        out[station_col_out] = out[station_col_out].astype("category")
 
     return out
 
 
 # ---------------------------- daily merge helper ----------------------------
 
+def mean_by_date(df: pd.DataFrame, *, date_col: str, cols: Sequence[str]) -> pd.DataFrame:
+    """
+    NaN-aware mean of cols per unique date (same result as groupby(date_col)[cols].mean()).
+    Sorts once and reduces contiguous date runs with np.add.reduceat.
+    Rows with a missing date are dropped, as groupby does.
+    """
+    has_date = df[date_col].notna()
+    if not has_date.all():
+        df = df[has_date]
+    dates = df[date_col].to_numpy()
+    if dates.size == 0:
+        return pd.DataFrame({date_col: dates, **{c: np.array([], dtype=float) for c in cols}})
+
+    order = np.argsort(dates, kind="stable")
+    dates_sorted = dates[order]
+    starts = np.concatenate(([0], np.flatnonzero(dates_sorted[1:] != dates_sorted[:-1]) + 1))
+
+    vals = df[list(cols)].to_numpy(dtype=np.float64)[order]
+    valid = ~np.isnan(vals)
+    sums = np.add.reduceat(np.where(valid, vals, 0.0), starts, axis=0)
+    counts = np.add.reduceat(valid.astype(np.int64), starts, axis=0)
+    means = np.divide(sums, counts, out=np.full_like(sums, np.nan), where=counts > 0)
+
+    out = pd.DataFrame(means, columns=list(cols))
+    out.insert(0, date_col, dates_sorted[starts])
+    return out
+
+
 def merge_daily_discharge_and_chemistry(
     wc_df: pd.DataFrame,
     q_df: pd.DataFrame,
@@ -140,9 +212,10 @@ def merge_daily_discharge_and_chemistry(
     """
     Creates a complete daily date range based on Q coverage, merges discharge and chemistry,
     averages duplicates by day (numeric only), and returns a daily DataFrame with station_col restored.
+    Chemistry columns that are also named discharge_col are ignored in favour of Q.
     """
-    wc = wc_df.copy()
-    q = q_df.copy()
+    # inputs are only filtered/dropped below (new frames), never modified
+    wc, q = wc_df, q_df
 
     # filter station
     if station_col in wc.columns:
@@ -153,21 +226,31 @@ def merge_daily_discharge_and_chemistry(
     if q.empty:
         raise ValueError(f"No discharge rows for station '{station_name}'")
 
-    q = q.drop_duplicates(subset=[date_col]).copy()
+    q = q.drop_duplicates(subset=[date_col])
 
-    full_dates = pd.date_range(q[date_col].min(), q[date_col].max(), freq="D")
-    out = pd.DataFrame({date_col: full_dates})
-    out = out.merge(q[[date_col, discharge_col]], on=date_col, how="left")
+    # full_dates is unique and contiguous, so both joins reduce to a reindex
+    full_dates = pd.date_range(q[date_col].min(), q[date_col].max(), freq="D", name=date_col)
+    q_daily = q.set_index(date_col)[[discharge_col]].reindex(full_dates)
 
     if isinstance(drop_wc_cols, list) or isinstance(drop_wc_cols, tuple):
         wc = wc.drop(columns=list(drop_wc_cols), errors="ignore")
 
-    out = out.merge(wc, on=date_col, how="left")
+    # only samples on a day of the range take part (the left merge dropped the
+    # others); this also removes NaT dates, which would be duplicate labels
+    in_range = wc[date_col].between(full_dates[0], full_dates[-1])
+    if not in_range.all():
+        wc = wc[in_range]
 
     # average duplicates by day (numeric only)
-    num_cols = out.select_dtypes(include="number").columns.tolist()
-    out_num = out.groupby(date_col)[num_cols].mean(numeric_only=True).reset_index()
-    out_num[station_col] = station_name
+    wc_cols = [c for c in wc.select_dtypes(include="number").columns if c != discharge_col]
+    if wc[date_col].is_unique:
+        # one sample per day already: nothing to average
+        wc_daily = wc.set_index(date_col)[wc_cols].reindex(full_dates)
+    else:
+        wc_daily = mean_by_date(wc, date_col=date_col, cols=wc_cols).set_index(date_col).reindex(full_dates)
+
+    out_num = pd.concat([q_daily, wc_daily], axis=1).astype(np.float64).reset_index()
+    out_num[station_col] = pd.Categorical.from_codes(np.zeros(len(out_num), dtype=np.int8), [station_name])
 
     cols = [date_col, station_col]
     if discharge_col in out_num.columns:
@@ -178,18 +261,42 @@ def merge_daily_discharge_and_chemistry(
 
 # ---------------------------- plotting convenience (optional) ----------------------------
 
-def save_or_show_plot(*, save_path: str | Path | None, dpi: int = 300) -> None:
+def new_figure(*, save_path: str | Path | None, **subplots_kw):
+    """
+    Create (fig, axes) for a plot that is either saved or shown.
+    When saving, build a bare Figure (Agg canvas) and skip pyplot's
+    interactive backend machinery; otherwise fall back to plt.subplots.
+    """
+    if save_path:
+        from matplotlib.figure import Figure
+
+        figsize = subplots_kw.pop("figsize", None)
+        fig = Figure(figsize=figsize)
+        return fig, fig.subplots(**subplots_kw)
+
+    import matplotlib.pyplot as plt  # local import to keep utils lighter
+
+    return plt.subplots(**subplots_kw)
+
+
+def save_or_show_plot(*, save_path: str | Path | None, dpi: int = 300, fig=None) -> None:
     """
     Standardize the repeated pattern:
       if save_path: mkdir + savefig + close
       else: show
-    Assumes you already created the figure using matplotlib.pyplot.
+    Assumes you already created the figure using matplotlib.pyplot,
+    or pass fig= for a figure created with new_figure().
     """
     import matplotlib.pyplot as plt  # local import to keep utils lighter
 
     if save_path:
         p = Path(save_path)
         p.parent.mkdir(parents=True, exist_ok=True)
+        if fig is not None:
+            fig.savefig(p, dpi=dpi, bbox_inches="tight")
+            # not registered with pyplot; drop the artists now rather than at the next gc cycle
+            fig.clear()
+            return
         plt.savefig(p, dpi=dpi, bbox_inches="tight")
         plt.close()
     else:
@@ -43,11 +43,13 @@ def read_data_template(file_path):
         sheet_name="Data",
         skiprows=1,
         header=[0, 1],
-        parse_dates=[2],
-        date_parser=lambda x: pd.to_datetime(x, format="%Y.%m.%d"),
     )
     df = merge_multi_header(df)
 
+    # Parse the date column (third column) in one vectorised call
+    date_col = df.columns[2]
+    df[date_col] = pd.to_datetime(df[date_col], format="%Y.%m.%d", cache=True)
+
     return df
 
 
@@ -179,20 +181,15 @@ def extract_lod_flags(df):
     Returns
         Dataframe.
     """
+    vals = df["value"].astype(str)
 
-    def f(row):
-        if "<" in str(row["value"]):
-            val = "<"
-        elif ">" in str(row["value"]):
-            val = ">"
-        else:
-            val = np.nan
-        return val
-
-    df["flag1"] = df.apply(f, axis=1)
-    df["value"] = (
-        df["value"].astype(str).str.extract("([-+]?\d*\.\d+|\d+)", expand=True)
-    )
+    # '<' takes precedence if a value somehow contains both
+    flags = pd.Series(np.nan, index=df.index, dtype=object)
+    flags[vals.str.contains(">", regex=False).to_numpy()] = ">"
+    flags[vals.str.contains("<", regex=False).to_numpy()] = "<"
+
+    df["flag1"] = flags
+    df["value"] = vals.str.extract(r"([-+]?\d*\.\d+|\d+)", expand=True)
     df["value"] = df["value"].astype(float)
 
     return df
@@ -218,11 +215,16 @@ def remove_duplicates(df, how="mean"):
     assert how in ("mean", "drop"), "'how' must be either 'mean' or 'drop'."
 
     if how == "mean":
+        # 'first' on a categorical flag works on the integer codes; cast back so
+        # the upload step sees the original dtype (object -> VARCHAR)
+        flag_dtype = df["flag1"].dtype
         df = (
-            df.groupby(["station_id", "date", "method_id"])
+            df.assign(flag1=df["flag1"].astype("category"))
+            .groupby(["station_id", "date", "method_id"])
             .aggregate({"value": "mean", "flag1": "first"})
             .reset_index()
         )
+        df["flag1"] = df["flag1"].astype(flag_dtype)
     else:
         # Drop
         df = df.drop_duplicates(
@@ -368,6 +370,28 @@ def process_template(xl_path, eng, dups="mean", dry_run=True):
     return (ws_df, df)
 
 
+def _microequivalent_factor(col):
+    """Parameter name and mass/l -> ueq/l factor for a column named 'par_unit'.
+
+    Args
+        col: Str. Column name, e.g. 'Ca_mg/l'
+
+    Returns
+        Tuple (par, factor).
+    """
+    # Separate par and unit
+    parts = col.split("_")
+    par = "_".join(parts[:-1])
+    unit = parts[-1]
+
+    # Determine unit factor
+    if unit[0] not in SI_PREFIX_DICT.keys():
+        raise ValueError("Unit factor could not be identified.")
+    factor = SI_PREFIX_DICT[unit[0]]
+
+    return par, VALENCY_DICT[par] * factor / MOLAR_MASS_DICT[par]
+
+
 def convert_to_microequivalents(df, col):
     """Basic conversion from mass/l to microequivalents/l.
 
@@ -378,19 +402,28 @@ def convert_to_microequivalents(df, col):
     Returns
         A new column is added to 'df' with values in ueq/l.
     """
-    if col in df.columns:
-        # Separate par and unit
-        parts = col.split("_")
-        par = "_".join(parts[:-1])
-        unit = parts[-1]
+    return convert_all_to_microequivalents(df, [col])
 
-        # Determine unit factor
-        if unit[0] not in SI_PREFIX_DICT.keys():
-            raise ValueError("Unit factor could not be identified.")
-        else:
-            factor = SI_PREFIX_DICT[unit[0]]
 
-        df[f"{par}_µeq/l"] = df[col] * VALENCY_DICT[par] * factor / MOLAR_MASS_DICT[par]
+def convert_all_to_microequivalents(df, cols):
+    """Convert several mass/l columns to microequivalents/l in one multiply.
+    Columns not present in 'df' are skipped.
+
+    Args
+        df:   Dataframe
+        cols: List of str. Columns in 'df' named 'par_unit'
+
+    Returns
+        New '<par>_µeq/l' columns are added to 'df'.
+    """
+    cols = [c for c in cols if c in df.columns]
+    if not cols:
+        return df
+
+    pars, factors = zip(*(_microequivalent_factor(c) for c in cols))
+    values = df[cols].to_numpy(dtype=float) * np.array(factors)
+    for idx, par in enumerate(pars):
+        df[f"{par}_µeq/l"] = values[:, idx]
 
     return df
 
@@ -408,25 +441,23 @@ def calculate_anc(df, anc_oaa=False):
     Returns
         New column(s) added to 'df'.
     """
-    for par in ["NH4-N_µeq/l", "K_µeq/l"]:
-        if par in df.columns:
-            df[par + "_temp"] = df[par].fillna(0)
-        else:
-            df[par + "_temp"] = 0
+    # Zero-filled NH4 and K, kept local rather than as temporary columns
+    filled = {
+        par: df[par].fillna(0) if par in df.columns else 0
+        for par in ["NH4-N_µeq/l", "K_µeq/l"]
+    }
 
     df["ANC_µeq/l"] = (
         df["Ca_µeq/l"]
         + df["Mg_µeq/l"]
         + df["Na_µeq/l"]
-        + df["K_µeq/l_temp"]
-        + df["NH4-N_µeq/l_temp"]
+        + filled["K_µeq/l"]
+        + filled["NH4-N_µeq/l"]
         - df["Cl_µeq/l"]
         - df["SO4_µeq/l"]
         - df["NO3-N_µeq/l"]
     )
 
-    del df["NH4-N_µeq/l_temp"], df["K_µeq/l_temp"]
-
     if anc_oaa:
         df["ANCoaa_µeq/l"] = df["ANC_µeq/l"] - 3.4 * df["TOC_mg C/l"]
 
@@ -455,23 +486,13 @@ def calculate_organic_anions(df, site_density, pK1=3.04, pK2=4.42, pK3=6.70):
     """
     K1, K2, K3 = 10**-pK1, 10**-pK2, 10**-pK3
 
-    df["H+"] = 10 ** -df["pH_"]
-    df["H3A"] = df["H+"] ** 3 / (
-        df["H+"] ** 3 + K1 * df["H+"] ** 2 + K1 * K2 * df["H+"] + K1 * K2 * K3
-    )
-    df["H2A-"] = K1 * df["H3A"] / df["H+"]
-    df["HA2-"] = K1 * K2 * df["H3A"] / (df["H+"] ** 2)
-    df["A3-"] = K1 * K2 * K3 * df["H3A"] / (df["H+"] ** 3)
-    df["Hruska_Factor"] = (
-        site_density * (df["H2A-"] + 2 * df["HA2-"] + 3 * df["A3-"]) / 3
-    )
-    df["OrgAnions_µeq/l"] = df["Hruska_Factor"] * df["TOC_mg C/l"]
-
-    df.drop(
-        ["H+", "H3A", "H2A-", "HA2-", "A3-", "Hruska_Factor"],
-        axis="columns",
-        inplace=True,
-    )
+    # Charge per mole of acid from the speciation fractions; substituting
+    # H2A- = K1*H3A/H, HA2- = K1*K2*H3A/H**2 and A3- = K1*K2*K3*H3A/H**3 with
+    # H3A = H**3/den, everything shares one denominator
+    h = 10 ** -df["pH_"].to_numpy(dtype=float)
+    den = ((h + K1) * h + K1 * K2) * h + K1 * K2 * K3
+    charge = (K1 * h * h + 2 * K1 * K2 * h + 3 * K1 * K2 * K3) / den
+    df["OrgAnions_µeq/l"] = site_density * charge / 3 * df["TOC_mg C/l"].to_numpy(dtype=float)
 
     return df
 
@@ -483,8 +504,10 @@ def calculate_bicarbonate(df):
 
     If the [HCO3] < 0 it is set to 0.
     """
-    df["HCO3_µeq/l"] = df["ANC_µeq/l"] + df["H_µeq/l"] - df["OrgAnions_µeq/l"]
-    df["HCO3_µeq/l"] = np.where(df["HCO3_µeq/l"] < 0, 0, df["HCO3_µeq/l"])
+    # NaN propagates through np.maximum
+    df["HCO3_µeq/l"] = np.maximum(
+        (df["ANC_µeq/l"] + df["H_µeq/l"] - df["OrgAnions_µeq/l"]).to_numpy(), 0.0
+    )
 
     return df
 
@@ -511,16 +534,16 @@ def double_mad_from_median(data, thresh=3.5):
         Array of Bools where ones indicate outliers.
     """
     m = np.nanmedian(data)
-    abs_dev = np.abs(data - m)
-    left_mad = np.median(abs_dev[data <= m])
-    right_mad = np.median(abs_dev[data >= m])
+    dev = data - m
+    abs_dev = np.abs(dev)
+    left_mad = np.median(abs_dev[dev <= 0])
+    right_mad = np.median(abs_dev[dev >= 0])
     if (left_mad == 0) or (right_mad == 0):
         # Don't identify any outliers. Not strictly correct - see links above!
         return np.zeros_like(data, dtype=bool)
 
-    data_mad = left_mad * np.ones(len(data))
-    data_mad[data > m] = right_mad
+    # Points at the median have abs_dev == 0, so their score is already 0
+    data_mad = np.where(dev > 0, right_mad, left_mad)
     modified_z_score = 0.6745 * abs_dev / data_mad
-    modified_z_score[data == m] = 0
 
     return modified_z_score > thresh
@@ -1,8 +1,126 @@
 import os
+import re
+import json
+import datetime
+import functools
+import shutil
 import subprocess
+import selectors
+import collections
 import logging
+from pygeoapi.process.base import ProcessorExecuteError
 LOGGER = logging.getLogger(__name__)
 
+# How many of the most recent stdout/stderr lines to keep per container run
+# (everything is logged as it arrives, only the tail is kept in memory):
+MAX_KEPT_LINES = 1000
+
+# Seconds ensure_image() waits for "docker image inspect"
+# (it runs when processors are instantiated, which must not hang):
+IMAGE_INSPECT_TIMEOUT = 10
+
+def load_config(config_file_path):
+    '''
+    Return the parsed AQUAINFRA config file. It is only re-read when the
+    file changed (mtime), so instantiating processors does not hit the disk.
+    The returned dict is shared, do not modify it.
+    '''
+    return _load_config_cached(config_file_path, os.stat(config_file_path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=4)
+def _load_config_cached(config_file_path, mtime_ns):
+    LOGGER.debug('Reading config file %s', config_file_path)
+    with open(config_file_path, 'r') as config_file:
+        return json.load(config_file)
+
+
+def make_output_dir(output_dir):
+    '''
+    Create the (new) job output directory. Its parent is created once when the
+    processor is instantiated, so a single mkdir is usually enough. If the
+    parent was removed in the meantime, the whole chain is created.
+    '''
+    try:
+        os.mkdir(output_dir)
+    except FileExistsError:
+        pass
+    except FileNotFoundError:
+        os.makedirs(output_dir, exist_ok=True)
+
+
+@functools.lru_cache(maxsize=None)
+def resolve_executable(docker_executable):
+    '''
+    Absolute path of the docker executable, looked up in PATH once per process
+    (the config may just say "docker"). If it cannot be found, the name is
+    returned unchanged and running it reports the problem as before.
+    '''
+    if os.path.isabs(docker_executable):
+        return docker_executable
+    return shutil.which(docker_executable) or docker_executable
+
+
+# Dates are passed to the R scripts as yyyy-mm-dd:
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+def validate_iso_date(name, value):
+    '''
+    Check that the user input "name" is a valid yyyy-mm-dd date, before any
+    container is started. Raises ProcessorExecuteError naming the parameter,
+    otherwise returns the parsed datetime.date.
+    '''
+    try:
+        if not DATE_PATTERN.match(value):
+            raise ValueError(value)
+        parsed_date = datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ProcessorExecuteError(f'Invalid parameter "{name}": {value}. Please provide a date (yyyy-mm-dd).')
+    LOGGER.debug('The provided %s is valid: %s', name, parsed_date)
+    return parsed_date
+
+
+# Images already checked by ensure_image() in this process:
+_CHECKED_IMAGES = set()
+
+def ensure_image(docker_executable, image_name):
+    '''
+    Warn early if the image is not available locally, instead of letting the
+    first job fail or stall on an implicit pull. Only runs "docker image
+    inspect" (with a timeout), once per process and image; never pulls and
+    never raises, as "docker run" will report any remaining problem.
+    '''
+    docker_executable = resolve_executable(docker_executable)
+    key = (docker_executable, image_name)
+    if key in _CHECKED_IMAGES:
+        return
+    _CHECKED_IMAGES.add(key)
+
+    try:
+        inspect = subprocess.run([docker_executable, "image", "inspect", image_name],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            timeout=IMAGE_INSPECT_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        LOGGER.warning('Could not check docker image %s: %s', image_name, e)
+        return
+
+    if inspect.returncode == 0:
+        LOGGER.debug('Docker image %s is available locally', image_name)
+    else:
+        LOGGER.warning('Docker image %s not found locally, build or pull it '
+            'before running jobs', image_name)
+
+
+def make_container_name(image_name, job_id = None):
+    '''
+    Container name from the image name and the pygeoapi job id, which is
+    unique per job already. A random suffix is only used without a job id.
+    Note: Only [a-zA-Z0-9][a-zA-Z0-9_.-] are allowed
+    '''
+    suffix = job_id if job_id else os.urandom(5).hex()
+    return "%s_%s" % (image_name.split(':')[0], suffix)
+
+
 def run_docker_container(
         docker_executable,
         image_name,
@@ -12,7 +130,7 @@ def run_docker_container(
         inputs_read_only,
         script_args
     ):
-    LOGGER.debug('Prepare running docker container (image %s)' % image_name)
+    LOGGER.debug('Prepare running docker container (image %s)', image_name)
 
     # Create container name
     # Note: Only [a-zA-Z0-9][a-zA-Z0-9_.-] are allowed
@@ -27,29 +145,22 @@ def run_docker_container(
     local_out = os.path.join(download_dir, "out")
 
     # Ensure directories exist
-    os.makedirs(local_out, exist_ok=True)
+    make_output_dir(local_out)
 
     # Replace paths in args:
+    mounts = [(inputs_read_only, container_in_readonly), (local_out, container_out)]
     sanitized_args = []
-    LOGGER.debug('Args before sanitizing: %s' % script_args)
+    LOGGER.debug('Args before sanitizing: %s', script_args)
     for arg in script_args:
         newarg = arg
         if arg is None:
             newarg = 'null'
-            LOGGER.debug("Replaced argument %s by %s..." % (arg, newarg))
-        elif type(arg) == type(True):
-            LOGGER.debug('Found a boolean: %s' % arg)
-            if arg == True:
-                newarg = 'true'
-            elif arg == False:
-                newarg = 'false'
-            LOGGER.debug("Replaced argument %s by %s..." % (arg, newarg))
-        elif inputs_read_only in arg:
-            newarg = arg.replace(inputs_read_only, container_in_readonly)
-            LOGGER.debug("Replaced argument %s by %s..." % (arg, newarg))
-        elif local_out in arg:
-            newarg = arg.replace(local_out, container_out)
-            LOGGER.debug("Replaced argument %s by %s..." % (arg, newarg))
+        elif isinstance(arg, bool):
+            newarg = 'true' if arg else 'false'
+        else:
+            newarg = replace_mounted_path(arg, mounts)
+        if newarg is not arg:
+            LOGGER.debug("Replaced argument %s by %s...", arg, newarg)
         sanitized_args.append(newarg)
 
     # Prepare container command
@@ -64,25 +175,19 @@ def run_docker_container(
         image_name,
     ]
     docker_command = docker_args + sanitized_args
-    LOGGER.debug('Docker command: %s' % docker_command)
+    LOGGER.debug('Docker command: %s', docker_command)
     
     # Run container
-    try:
-        LOGGER.debug('Start running docker container (image %s)' % image_name)
-        result = subprocess.run(docker_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout = result.stdout.decode()
-        stderr = result.stderr.decode()
-        LOGGER.debug('Finished running docker container (image %s)' % image_name)
-        log_all_docker_output(stdout, stderr)
-        return result.returncode, stdout, stderr, "no error"
-
-    except subprocess.CalledProcessError as e:
-        returncode = e.returncode
-        stdout = e.stdout.decode()
-        stderr = e.stderr.decode()
-        LOGGER.error('Failed running docker container (exit code %s)' % returncode)
-        user_err_msg = get_error_message_from_docker_stderr(stderr)
-        return returncode, stdout, stderr, user_err_msg
+    LOGGER.debug('Start running docker container (image %s)', image_name)
+    returncode, stdout_lines, stderr_lines = run_and_stream_output(docker_command)
+    stdout, stderr = '\n'.join(stdout_lines), '\n'.join(stderr_lines)
+    if returncode == 0:
+        LOGGER.debug('Finished running docker container (image %s)', image_name)
+        return returncode, stdout, stderr, "no error"
+
+    LOGGER.error('Failed running docker container (exit code %s)', returncode)
+    user_err_msg = get_error_message_from_docker_stderr(stderr_lines)
+    return returncode, stdout, stderr, user_err_msg
 
 
 def run_docker_container2(
@@ -92,28 +197,27 @@ def run_docker_container2(
         input_dir_on_host,
         output_dir_on_host,
         readonly_dir_on_host,
-        script_args
+        script_args,
+        job_id = None
     ):
 
     # Create container name
-    # Note: Only [a-zA-Z0-9][a-zA-Z0-9_.-] are allowed
-    # TODO: Use job-id?
-    container_name = "%s_%s" % (image_name.split(':')[0], os.urandom(5).hex())
-    LOGGER.debug(f'Prepare running docker: image {image_name}, container: {container_name}')
+    container_name = make_container_name(image_name, job_id)
+    LOGGER.debug('Prepare running docker: image %s, container: %s', image_name, container_name)
 
     # Define paths inside the container
     container_out = '/out'
     container_in = '/in'
     container_readonly = '/readonly'
-    LOGGER.debug('Mounted dirs /out,/in,/readonly, inside container:  %s, %s, %s' %
-        (container_out, container_in, container_readonly))
+    LOGGER.debug('Mounted dirs /out,/in,/readonly, inside container:  %s, %s, %s',
+        container_out, container_in, container_readonly)
 
     # Define paths outside the container
     host_out = output_dir_on_host
     host_in = input_dir_on_host
     host_readonly = readonly_dir_on_host
-    LOGGER.debug('Mounted dirs /out,/in,/readonly, outside container: %s, %s, %s' %
-        (host_out, host_in, host_readonly))
+    LOGGER.debug('Mounted dirs /out,/in,/readonly, outside container: %s, %s, %s',
+        host_out, host_in, host_readonly)
 
     # Make sure no trailing slash:
     host_out      = host_out.rstrip("/")      if host_out else None
@@ -123,7 +227,8 @@ def run_docker_container2(
     # Sanitize arguments passed to container!
     # i.e.: Replace host file paths by mounted file paths, convert args to formats
     # that can be passed to docker and understood/parsed in the R script inside docker:
-    LOGGER.debug('Script args: %s' % script_args)
+    LOGGER.debug('Script args: %s', script_args)
+    mounts = [(host_in, container_in), (host_out, container_out), (host_readonly, container_readonly)]
     sanitized_args = []
     for arg in script_args:
         newarg = arg
@@ -133,16 +238,10 @@ def run_docker_container2(
             newarg = 'null'
         elif isinstance(arg, bool):
             newarg = "true" if arg else "false"
-            #LOGGER.debug(f'Arg: {arg}, type {type(arg)}, newarg {newarg}, type {type(newarg)}...)')
-        elif host_in is not None and host_in in arg:
-            newarg = arg.replace(host_in, container_in)
-            LOGGER.debug("Replaced argument %s by %s..." % (arg, newarg))
-        elif host_out is not None and host_out in arg:
-            newarg = arg.replace(host_out, container_out)
-            LOGGER.debug("Replaced argument %s by %s..." % (arg, newarg))
-        elif host_readonly is not None and host_readonly in arg:
-            newarg = arg.replace(host_readonly, container_readonly)
-            LOGGER.debug("Replaced argument %s by %s..." % (arg, newarg))
+        else:
+            newarg = replace_mounted_path(arg, mounts)
+            if newarg is not arg:
+                LOGGER.debug("Replaced argument %s by %s...", arg, newarg)
         sanitized_args.append(newarg)
 
     # Prepare container command
@@ -152,42 +251,31 @@ def run_docker_container2(
     ]
     # Add the mounts for three directories (-v) (ro and rw):
     if host_out is not None:
-        docker_args = docker_args + ["-v", f"{host_out}:{container_out}:rw"]
+        docker_args.extend(["-v", f"{host_out}:{container_out}:rw"])
     if host_in is not None:
-        docker_args = docker_args + ["-v", f"{host_in}:{container_in}:rw"]
+        docker_args.extend(["-v", f"{host_in}:{container_in}:rw"])
     if host_readonly is not None:
-        docker_args = docker_args + ["-v", f"{host_readonly}:{container_readonly}:ro"]
+        docker_args.extend(["-v", f"{host_readonly}:{container_readonly}:ro"])
     # Add the name of the script to be called (-e), and the name of the image
-    docker_args = docker_args + [
+    docker_args.extend([
         "-e", f"SCRIPT={script_name}",
         image_name
-    ]
+    ])
     # Add the arguments to be passed to the R script:
     docker_command = docker_args + sanitized_args
-    LOGGER.debug('Docker command: %s' % docker_command)
+    LOGGER.debug('Docker command: %s', docker_command)
 
-    # Run container
-    try:
-        LOGGER.debug('Start running docker container')
-        result = subprocess.run(docker_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout = result.stdout.decode()
-        stderr = result.stderr.decode()
+    # Run container (docker output is logged line by line while it runs)
+    LOGGER.debug('Start running docker container')
+    returncode, stdout_lines, stderr_lines = run_and_stream_output(docker_command)
+    stdout, stderr = '\n'.join(stdout_lines), '\n'.join(stderr_lines)
+    if returncode == 0:
         LOGGER.debug('Finished running docker container')
+        return returncode, stdout, stderr, "no error"
 
-        # Print docker output:
-        LOGGER.debug('DOCKER OUTPUT:')
-        log_all_docker_output(stdout, stderr)
-
-        return result.returncode, stdout, stderr, "no error"
-
-    except subprocess.CalledProcessError as e:
-        returncode = e.returncode
-        stdout = e.stdout.decode()
-        stderr = e.stderr.decode()
-        LOGGER.error('Failed running docker container (exit code %s)' % returncode)
-        log_all_docker_output(stdout, stderr)
-        user_err_msg = get_error_message_from_docker_stderr(stderr)
-        return returncode, stdout, stderr, user_err_msg
+    LOGGER.error('Failed running docker container (exit code %s)', returncode)
+    user_err_msg = get_error_message_from_docker_stderr(stderr_lines)
+    return returncode, stdout, stderr, user_err_msg
 
 
 
@@ -197,23 +285,27 @@ def run_docker_container3(
         image_name,
         script_name,
         output_dir_on_host,
-        script_args
+        script_args,
+        job_id = None,
+        tmpfs_size = None
     ):
     # Same as run_docker_container2, but simplified: Only output directory is passed!
+    # If tmpfs_size is given (e.g. "512m"), /tmp inside the container is a tmpfs
+    # of that size, so R's tempfile() scratch files (e.g. downloaded zips) are
+    # kept in memory instead of going through the container's overlay filesystem.
+    # The results are written to /out, which is a bind mount anyway.
 
     # Create container name
-    # Note: Only [a-zA-Z0-9][a-zA-Z0-9_.-] are allowed
-    # TODO: Use job-id?
-    container_name = "%s_%s" % (image_name.split(':')[0], os.urandom(5).hex())
-    LOGGER.debug(f'Prepare running docker: image {image_name}, container: {container_name}')
+    container_name = make_container_name(image_name, job_id)
+    LOGGER.debug('Prepare running docker: image %s, container: %s', image_name, container_name)
 
     # Define paths inside the container
     container_out = '/out'
-    LOGGER.debug('Mounted dir /out inside container:  %s' % container_out)
+    LOGGER.debug('Mounted dir /out inside container:  %s', container_out)
 
     # Define paths outside the container
     host_out = output_dir_on_host
-    LOGGER.debug('Mounted dir /out outside container: %s' % host_out)
+    LOGGER.debug('Mounted dir /out outside container: %s', host_out)
 
     # Make sure no trailing slash:
     host_out      = host_out.rstrip("/")      if host_out else None
@@ -221,7 +313,8 @@ def run_docker_container3(
     # Sanitize arguments passed to container!
     # i.e.: Replace host file paths by mounted file paths, convert args to formats
     # that can be passed to docker and understood/parsed in the R script inside docker:
-    LOGGER.debug('Script args (before sanitizing): %s' % script_args)
+    LOGGER.debug('Script args (before sanitizing): %s', script_args)
+    mounts = [(host_out, container_out)]
     sanitized_args = []
     for arg in script_args:
         if arg is None or arg == 'None':
@@ -230,20 +323,19 @@ def run_docker_container3(
             newarg = 'null'
         elif isinstance(arg, bool):
             newarg = "true" if arg else "false"
-        elif isinstance(arg, str) and host_out is not None and host_out in arg:
-            # If arg is float, "host_out in arg" causes: TypeError: argument of type 'float' is not iterable
-            newarg = arg.replace(host_out, container_out)
+        elif isinstance(arg, str):
+            newarg = replace_mounted_path(arg, mounts)
         else:
             # In any case, the newarg has to be a string:
             newarg = str(arg)
         
         if not arg == newarg:
-            LOGGER.debug(f'Replaced arg: {arg} (type {type(arg)}), by {newarg} (type {type(newarg)})')
+            LOGGER.debug('Replaced arg: %s (type %s), by %s (type %s)', arg, type(arg), newarg, type(newarg))
 
         # All args, even the ones that did not change, have to be appended (as it is a new list):
         sanitized_args.append(newarg)
     
-    LOGGER.debug('Script args (after sanitizing): %s' % sanitized_args)
+    LOGGER.debug('Script args (after sanitizing): %s', sanitized_args)
 
     # Prepare container command
     docker_args = [
@@ -253,58 +345,125 @@ def run_docker_container3(
 
     # Add the mounts for three directories (-v) (ro and rw):
     if host_out is not None:
-        docker_args = docker_args + ["-v", f"{host_out}:{container_out}:rw"]
+        docker_args.extend(["-v", f"{host_out}:{container_out}:rw"])
+
+    # Scratch space in memory:
+    if tmpfs_size is not None:
+        docker_args.extend(["--tmpfs", f"/tmp:rw,size={tmpfs_size}"])
 
     # Add the name of the script to be called (-e), and the name of the image
-    docker_args = docker_args + [
+    docker_args.extend([
         "-e", f"SCRIPT={script_name}",
         image_name
-    ]
+    ])
 
     # Add the arguments to be passed to the R script:
     docker_command = docker_args + sanitized_args
-    LOGGER.debug('Docker command: %s' % docker_command)
+    LOGGER.debug('Docker command: %s', docker_command)
 
-    # Run container
-    try:
-        LOGGER.debug('Start running docker container')
-        result = subprocess.run(docker_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout = result.stdout.decode()
-        stderr = result.stderr.decode()
+    # Run container (docker output is logged line by line while it runs)
+    LOGGER.debug('Start running docker container')
+    returncode, stdout_lines, stderr_lines = run_and_stream_output(docker_command)
+    stdout, stderr = '\n'.join(stdout_lines), '\n'.join(stderr_lines)
+    if returncode == 0:
         LOGGER.debug('Finished running docker container')
+        return returncode, stdout, stderr, "no error"
+
+    LOGGER.error('Failed running docker container (exit code %s)', returncode)
+    user_err_msg = get_error_message_from_docker_stderr(stderr_lines, log_all_lines = False)
+    LOGGER.info(f'Extracted this error message: {user_err_msg}')
+    return returncode, stdout, stderr, user_err_msg
+
+
+
+def replace_mounted_path(arg, mounts):
+    '''
+    If arg is a path under one of the mounted host directories, replace that
+    host directory by the path it is mounted at inside the container (first
+    match wins). mounts is a list of (host_dir, container_dir); host_dir may
+    be None (not mounted). Non-string args are returned as is.
+    Only the start of arg is checked: the processors always pass paths that
+    start with the mounted dir, other args (URLs, dates, ...) are left alone.
+    '''
+    if not isinstance(arg, str):
+        return arg
+    for host_dir, container_dir in mounts:
+        if host_dir and arg.startswith(host_dir):
+            return container_dir + arg[len(host_dir):]
+    return arg
 
-        # Print docker output:
-        LOGGER.debug('DOCKER OUTPUT:')
-        log_all_docker_output(stdout, stderr)
 
-        return result.returncode, stdout, stderr, "no error"
+def run_and_stream_output(docker_command, max_kept_lines = MAX_KEPT_LINES):
+    '''
+    Run the command and log its stdout/stderr line by line while it runs,
+    instead of collecting the whole output in memory first.
+
+    Only the last max_kept_lines lines of each stream are kept. They are
+    returned as lists of lines, so that the R error message (which is at the
+    end of stderr) can still be extracted without splitting them again.
+
+    Returns (returncode, stdout_lines, stderr_lines).
+    '''
+    docker_command = [resolve_executable(docker_command[0])] + docker_command[1:]
+    proc = subprocess.Popen(docker_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
-    except subprocess.CalledProcessError as e:
-        returncode = e.returncode
-        stdout = e.stdout.decode()
-        stderr = e.stderr.decode()
-        LOGGER.error('Failed running docker container (exit code %s)' % returncode)
-        log_all_docker_output(stdout, stderr)
-        user_err_msg = get_error_message_from_docker_stderr(stderr, log_all_lines = False)
-        LOGGER.info(f'Extracted this error message: {user_err_msg}')
-        return returncode, stdout, stderr, user_err_msg
+    kept = {
+        'stdout': collections.deque(maxlen=max_kept_lines), # output of print() in R-script
+        'stderr': collections.deque(maxlen=max_kept_lines), # output of message() in R-script
+    }
+    pending = {'stdout': b'', 'stderr': b''}
 
+    def handle_line(name, raw):
+        line = raw.decode(errors='replace').rstrip('\r')
+        if line:
+            LOGGER.debug('Docker %s: %s', name, line)
+        kept[name].append(line)
+
+    with selectors.DefaultSelector() as selector:
+        selector.register(proc.stdout, selectors.EVENT_READ, 'stdout')
+        selector.register(proc.stderr, selectors.EVENT_READ, 'stderr')
+        while selector.get_map():
+            for key, _ in selector.select():
+                name = key.data
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    # Stream closed: flush an unterminated last line
+                    selector.unregister(key.fileobj)
+                    if pending[name]:
+                        handle_line(name, pending[name])
+                    continue
+                *lines, pending[name] = (pending[name] + chunk).split(b'\n')
+                for raw in lines:
+                    handle_line(name, raw)
+
+    returncode = proc.wait()
+    proc.stdout.close()
+    proc.stderr.close()
+
+    return returncode, list(kept['stdout']), list(kept['stderr'])
+
+
+def _as_lines(output):
+    # Docker output may be passed as one string or as a list of lines:
+    if isinstance(output, str):
+        return output.splitlines()
+    return output
 
 
 def log_all_docker_output(stdout, stderr):
 
     LOGGER.debug('______________')
     LOGGER.debug('Docker stdout:')
-    for line in stdout.split('\n'):
+    for line in _as_lines(stdout):
         if line:
-            LOGGER.debug('Docker stdout: %s' % line)
+            LOGGER.debug('Docker stdout: %s', line)
             # output of print() in R-script
 
     LOGGER.debug('______________')
     LOGGER.debug('Docker sterr:')
-    for line in stderr.split('\n'):
+    for line in _as_lines(stderr):
         if line:
-            LOGGER.debug('Docker stderr: %s' % line)
+            LOGGER.debug('Docker stderr: %s', line)
             # output of message() in R-script
 
 
@@ -324,12 +483,15 @@ def get_error_message_from_docker_stderr(stderr, log_all_lines = True):
 
     Now, how to capture the meaningful part of that, which we want to return
     to the user? Here is a first attempt:
+
+    stderr can be one string or a list of lines (as returned by
+    run_and_stream_output).
     '''
 
     user_err_msg = ""
     error_on_previous_line = False
     colon_on_previous_line = False
-    for line in stderr.split('\n'):
+    for line in _as_lines(stderr):
 
         # Skip empty lines:
         if not line:
@@ -337,38 +499,32 @@ def get_error_message_from_docker_stderr(stderr, log_all_lines = True):
 
         # Print all non-empty lines to log:
         if log_all_lines:
-            LOGGER.error('Docker stderr: %s' % line)
+            LOGGER.error('Docker stderr: %s', line)
+
+        stripped = line.strip()
 
         # R error messages may start with the word "Error"
-        if line.startswith("Error") or line.startswith("Fatal error"):
-            #LOGGER.debug('### Found explicit error line: %s' % line.strip())
-            user_err_msg += line.strip()
+        if line.startswith(("Error", "Fatal error")):
+            user_err_msg += stripped
             error_on_previous_line = True
 
         # When R error messages are continued on another line, they may be
         # indented by two spaces.
-        elif line.startswith("  ") and error_on_previous_line:
-            #LOGGER.debug('### Found indented line following an error: %s' % line.strip())
-            user_err_msg += " "+line.strip()
-            error_on_previous_line = True
+        elif error_on_previous_line and line.startswith("  "):
+            user_err_msg += " "+stripped
 
         # When R error messages end with a colon, they will be continued on
         # the next line, independently of their indentation I guess!
         elif colon_on_previous_line:
-            #LOGGER.debug('### Found line following a colon: %s' % line.strip())
-            user_err_msg += " "+line.strip()
+            user_err_msg += " "+stripped
             error_on_previous_line = True
 
         else:
-            #LOGGER.debug('### Do not pass back to user: %s' % line.strip())
             error_on_previous_line = False
 
         # Remember whether this line ended with a colon, indicating that the
         # next line will continue with the error message:
-        colon_on_previous_line = False
-        if line.strip().endswith(":"):
-            #LOGGER.debug('### Found a colon, next line will still be error!')
-            colon_on_previous_line = True
+        colon_on_previous_line = stripped.endswith(":")
 
     return user_err_msg
 
@@ -72,7 +72,8 @@ curl -X POST https://${PYSERVER}/processes/netcdf-assessment-area/execution \
 # Has to be in a JSON file of the same name, in the same dir! 
 script_title_and_path = __file__
 metadata_title_and_path = script_title_and_path.replace('.py', '.json')
-PROCESS_METADATA = json.load(open(metadata_title_and_path))
+with open(metadata_title_and_path) as metadata_file:
+    PROCESS_METADATA = json.load(metadata_file)
 
 
 
@@ -83,13 +84,15 @@ class NivaNetcdfAssessmentAreaProcessor(BaseProcessor):
         self.job_id = None
         self.process_id = self.metadata["id"]
         config_file_path = os.environ.get('AQUAINFRA_CONFIG_FILE', "./config.json")
-        with open(config_file_path, 'r') as config_file:
-            config = json.load(config_file)
-            self.download_dir = config["download_dir"].rstrip('/')
-            self.download_url = config["download_url"].rstrip('/')
-            self.docker_executable = config["docker_executable"]
-            self.image_name = "ferry-rscripts:20260422-b0a726b"
-            self.script_name = 'netcdf_assessment_area.R'
+        config = docker_utils.load_config(config_file_path)
+        self.download_dir = config["download_dir"].rstrip('/')
+        self.download_url = config["download_url"].rstrip('/')
+        # Parent of all job output dirs, created once (see make_output_dir):
+        os.makedirs(f'{self.download_dir}/out/{self.process_id}', exist_ok=True)
+        self.docker_executable = config["docker_executable"]
+        self.image_name = "ferry-rscripts:20260422-b0a726b"
+        self.script_name = 'netcdf_assessment_area.R'
+        docker_utils.ensure_image(self.docker_executable, self.image_name)
 
 
     def set_job_id(self, job_id: str):
@@ -169,7 +172,7 @@ class NivaNetcdfAssessmentAreaProcessor(BaseProcessor):
         # Where to store output data
         output_dir = f'{self.download_dir}/out/{self.process_id}/job_{self.job_id}'
         output_url = f'{self.download_url}/out/{self.process_id}/job_{self.job_id}'
-        os.makedirs(output_dir, exist_ok=True)
+        docker_utils.make_output_dir(output_dir)
         LOGGER.debug(f'All results will be stored     in: {output_dir}')
         LOGGER.debug(f'All results will be accessible in: {output_url}')
         # Output filename
@@ -197,7 +200,9 @@ class NivaNetcdfAssessmentAreaProcessor(BaseProcessor):
             self.image_name,
             self.script_name,
             output_dir,
-            r_args
+            r_args,
+            job_id=self.job_id,
+            tmpfs_size="512m" # study area zip is downloaded to tempfile()
         )
 
         # Return R error message if exit code not 0:
@@ -5,13 +5,16 @@ LOGGER = logging.getLogger(__name__)
 import json
 import os
 import traceback
-import datetime
+import re
 import requests
 # niva repo has hyphen in it, so we cannot import it in the normal python way:
 #from pygeoapi.process.niva-aquainfra.pygeoapi_processes.docker_utils import run_docker_container3
 import importlib  
 docker_utils = importlib.import_module("pygeoapi.process.niva-aquainfra.pygeoapi_processes.docker_utils")
 
+# Names of the NetCDF variables (also used in the output filename):
+PARAM_PATTERN = re.compile(r"^[\w.-]+$")
+
 
 '''
 # Without a bounding box:
@@ -64,7 +67,8 @@ This is the order that the OGC API wants (bbox):
 # Has to be in a JSON file of the same name, in the same dir! 
 script_title_and_path = __file__
 metadata_title_and_path = script_title_and_path.replace('.py', '.json')
-PROCESS_METADATA = json.load(open(metadata_title_and_path))
+with open(metadata_title_and_path) as metadata_file:
+    PROCESS_METADATA = json.load(metadata_file)
 
 
 
@@ -77,13 +81,15 @@ class NivaFerryboxExtractionProcessor(BaseProcessor):
 
         # Set config:
         config_file_path = os.environ.get('AQUAINFRA_CONFIG_FILE', "./config.json")
-        with open(config_file_path, 'r') as config_file:
-            config = json.load(config_file)
-            self.download_dir = config["download_dir"].rstrip('/')
-            self.download_url = config["download_url"].rstrip('/')
-            self.docker_executable = config["docker_executable"]
-            self.image_name = "ferry-rscripts:20260422-b0a726b"
-            self.script_name = 'netcdf_extract_fb_data.R'
+        config = docker_utils.load_config(config_file_path)
+        self.download_dir = config["download_dir"].rstrip('/')
+        self.download_url = config["download_url"].rstrip('/')
+        # Parent of all job output dirs, created once (see make_output_dir):
+        os.makedirs(f'{self.download_dir}/out/{self.process_id}', exist_ok=True)
+        self.docker_executable = config["docker_executable"]
+        self.image_name = "ferry-rscripts:20260422-b0a726b"
+        self.script_name = 'netcdf_extract_fb_data.R'
+        docker_utils.ensure_image(self.docker_executable, self.image_name)
 
 
     def set_job_id(self, job_id: str):
@@ -131,10 +137,10 @@ class NivaFerryboxExtractionProcessor(BaseProcessor):
             lat_max = None
             lon_max = None
         else:
-            lat_min = study_area_bbox["bbox"][0]
-            lon_min = study_area_bbox["bbox"][1]
-            lat_max = study_area_bbox["bbox"][2]
-            lon_max = study_area_bbox["bbox"][3]
+            bbox = study_area_bbox.get("bbox") if isinstance(study_area_bbox, dict) else None
+            if not isinstance(bbox, list) or not len(bbox) == 4:
+                raise ProcessorExecuteError('Invalid parameter "study_area_bbox": %s. Please provide {"bbox": [lat_min, lon_min, lat_max, lon_max]}.' % study_area_bbox)
+            lat_min, lon_min, lat_max, lon_max = bbox
 
         # Check user inputs:
         if url_thredds is None:
@@ -146,10 +152,31 @@ class NivaFerryboxExtractionProcessor(BaseProcessor):
 
         # Check validity of argument:
         # Parse and validate the dates, to see whether it is valid:
-        parsed_date = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-        LOGGER.debug(f'The provided start_date is valid: {parsed_date}')
-        parsed_date = datetime.datetime.strptime(end_date, "%Y-%m-%d")
-        LOGGER.debug(f'The provided end_date is valid:   {parsed_date}')
+        docker_utils.validate_iso_date("start_date", start_date)
+        docker_utils.validate_iso_date("end_date", end_date)
+
+        # Validate parameters and bbox here, so bad requests fail right away
+        # instead of after starting the container:
+        if parameters is not None:
+            if isinstance(parameters, str):
+                # (a blank string means all parameters, like None)
+                param_names = [param.strip() for param in parameters.split(',')] if parameters.strip() else []
+            elif isinstance(parameters, list):
+                param_names = parameters
+            else:
+                param_names = [parameters]
+            for param in param_names:
+                if not isinstance(param, str) or not PARAM_PATTERN.match(param):
+                    raise ProcessorExecuteError(f'Invalid parameter "parameters": {parameters}. Please provide a list of parameter names (e.g. ["temperature", "salinity"]).')
+
+        if study_area_bbox is not None:
+            try:
+                bbox_values = [float(value) for value in bbox]
+            except (TypeError, ValueError):
+                raise ProcessorExecuteError(f'Invalid parameter "study_area_bbox": {study_area_bbox}. The values must be numbers.')
+            # Order: [lat_min, lon_min, lat_max, lon_max]
+            if not (-90 <= bbox_values[0] <= bbox_values[2] <= 90 and -180 <= bbox_values[1] <= bbox_values[3] <= 180):
+                raise ProcessorExecuteError(f'Invalid parameter "study_area_bbox": {study_area_bbox}. Please provide [lat_min, lon_min, lat_max, lon_max], with latitudes in -90..90 and longitudes in -180..180.')
 
         # Check existence:
         # Note: During testing, this gets HTTP 400. Maybe THREDDS does not reply to HEAD requests.
@@ -193,7 +220,7 @@ class NivaFerryboxExtractionProcessor(BaseProcessor):
 
         output_dir = f'{self.download_dir}/out/{self.process_id}/job_{self.job_id}'
         output_url = f'{self.download_url}/out/{self.process_id}/job_{self.job_id}'
-        os.makedirs(output_dir, exist_ok=True)
+        docker_utils.make_output_dir(output_dir)
         LOGGER.debug(f'All results will be stored     in: {output_dir}')
         LOGGER.debug(f'All results will be accessible in: {output_url}')
 
@@ -211,7 +238,8 @@ class NivaFerryboxExtractionProcessor(BaseProcessor):
             self.image_name,
             self.script_name,
             output_dir,
-            r_args
+            r_args,
+            job_id=self.job_id
         )
 
         if not returncode == 0:
@@ -5,7 +5,6 @@ LOGGER = logging.getLogger(__name__)
 import json
 import os
 import traceback
-import datetime
 import requests
 import importlib  
 docker_utils = importlib.import_module("pygeoapi.process.niva-aquainfra.pygeoapi_processes.docker_utils")
@@ -43,7 +42,8 @@ curl -X POST https://${PYSERVER}/processes/netcdf-logger-extract/execution \
 # Process metadata and description
 script_title_and_path = __file__
 metadata_title_and_path = script_title_and_path.replace('.py', '.json')
-PROCESS_METADATA = json.load(open(metadata_title_and_path))
+with open(metadata_title_and_path) as metadata_file:
+    PROCESS_METADATA = json.load(metadata_file)
 
 
 class NivaNetcdfLoggerExtractProcessor(BaseProcessor):
@@ -54,13 +54,15 @@ class NivaNetcdfLoggerExtractProcessor(BaseProcessor):
         self.process_id = self.metadata["id"]
 
         config_file_path = os.environ.get('AQUAINFRA_CONFIG_FILE', "./config.json")
-        with open(config_file_path, 'r') as config_file:
-            config = json.load(config_file)
-            self.download_dir = config["download_dir"].rstrip('/')
-            self.download_url = config["download_url"].rstrip('/')
-            self.docker_executable = config["docker_executable"]
-            self.image_name = "ferry-rscripts:20260422-b0a726b"
-            self.script_name = 'netcdf_logger_extract.R'
+        config = docker_utils.load_config(config_file_path)
+        self.download_dir = config["download_dir"].rstrip('/')
+        self.download_url = config["download_url"].rstrip('/')
+        # Parent of all job output dirs, created once (see make_output_dir):
+        os.makedirs(f'{self.download_dir}/out/{self.process_id}', exist_ok=True)
+        self.docker_executable = config["docker_executable"]
+        self.image_name = "ferry-rscripts:20260422-b0a726b"
+        self.script_name = 'netcdf_logger_extract.R'
+        docker_utils.ensure_image(self.docker_executable, self.image_name)
 
     def set_job_id(self, job_id: str):
         self.job_id = job_id
@@ -100,10 +102,8 @@ class NivaNetcdfLoggerExtractProcessor(BaseProcessor):
             raise ProcessorExecuteError("Missing parameter 'end_date'. Please provide a date (yyyy-mm-dd).")
 
         # Validate dates:
-        parsed_date = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-        LOGGER.debug(f'The provided start_date is valid: {parsed_date}')
-        parsed_date = datetime.datetime.strptime(end_date, "%Y-%m-%d")
-        LOGGER.debug(f'The provided end_date is valid:   {parsed_date}')
+        docker_utils.validate_iso_date("start_date", start_date)
+        docker_utils.validate_iso_date("end_date", end_date)
 
         ##################
         ### Input data ###
@@ -134,7 +134,7 @@ class NivaNetcdfLoggerExtractProcessor(BaseProcessor):
 
         output_dir = f'{self.download_dir}/out/{self.process_id}/job_{self.job_id}'
         output_url = f'{self.download_url}/out/{self.process_id}/job_{self.job_id}'
-        os.makedirs(output_dir, exist_ok=True)
+        docker_utils.make_output_dir(output_dir)
         LOGGER.debug(f'All results will be stored     in: {output_dir}')
         LOGGER.debug(f'All results will be accessible in: {output_url}')
 
@@ -158,7 +158,8 @@ class NivaNetcdfLoggerExtractProcessor(BaseProcessor):
             self.image_name,
             self.script_name,
             output_dir,
-            r_args
+            r_args,
+            job_id=self.job_id
         )
 
         if not returncode == 0:
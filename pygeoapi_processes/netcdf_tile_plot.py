@@ -5,7 +5,6 @@ LOGGER = logging.getLogger(__name__)
 import json
 import os
 import traceback
-import datetime
 import requests
 # niva repo has hyphen in it, so we cannot import it in the normal python way:
 #from pygeoapi.process.niva-aquainfra.pygeoapi_processes.docker_utils import run_docker_container3
@@ -36,7 +35,8 @@ curl -X POST https://${PYSERVER}/processes/netcdf-tile-plot/execution \
 # Has to be in a JSON file of the same name, in the same dir! 
 script_title_and_path = __file__
 metadata_title_and_path = script_title_and_path.replace('.py', '.json')
-PROCESS_METADATA = json.load(open(metadata_title_and_path))
+with open(metadata_title_and_path) as metadata_file:
+    PROCESS_METADATA = json.load(metadata_file)
 
 
 
@@ -47,13 +47,15 @@ class NivaTilePlotProcessor(BaseProcessor):
         self.job_id = None
         self.process_id = self.metadata["id"]
         config_file_path = os.environ.get('AQUAINFRA_CONFIG_FILE', "./config.json")
-        with open(config_file_path, 'r') as config_file:
-            config = json.load(config_file)
-            self.download_dir = config["download_dir"].rstrip('/')
-            self.download_url = config["download_url"].rstrip('/')
-            self.docker_executable = config["docker_executable"]
-            self.image_name = "ferry-rscripts:20260422-b0a726b"
-            self.script_name = 'netcdf_tile_plot.R'
+        config = docker_utils.load_config(config_file_path)
+        self.download_dir = config["download_dir"].rstrip('/')
+        self.download_url = config["download_url"].rstrip('/')
+        # Parent of all job output dirs, created once (see make_output_dir):
+        os.makedirs(f'{self.download_dir}/out/{self.process_id}', exist_ok=True)
+        self.docker_executable = config["docker_executable"]
+        self.image_name = "ferry-rscripts:20260422-b0a726b"
+        self.script_name = 'netcdf_tile_plot.R'
+        docker_utils.ensure_image(self.docker_executable, self.image_name)
 
 
     def set_job_id(self, job_id: str):
@@ -105,13 +107,10 @@ class NivaTilePlotProcessor(BaseProcessor):
             raise ProcessorExecuteError("Missing parameter 'parameters'. Please provide a list of parameters.") # TODO HOW MANY?
         
         # Parse and validate the dates, to see whether it is valid:
-        parsed_date = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-        LOGGER.debug(f'The provided start_date is valid: {parsed_date}')
-        parsed_date = datetime.datetime.strptime(end_date, "%Y-%m-%d")
-        LOGGER.debug(f'The provided end_date is valid: {parsed_date}')
+        docker_utils.validate_iso_date("start_date", start_date)
+        docker_utils.validate_iso_date("end_date", end_date)
         if storm_date is not None:
-            parsed_date = datetime.datetime.strptime(storm_date, "%Y-%m-%d")
-            LOGGER.debug(f'The provided storm_date is valid: {parsed_date}')
+            docker_utils.validate_iso_date("storm_date", storm_date)
         # Parse the latitudes, to check whether they ar enumbers
         if lat1 is not None:
             float(lat1)
@@ -146,7 +145,7 @@ class NivaTilePlotProcessor(BaseProcessor):
         # Where to store output data
         output_dir = f'{self.download_dir}/out/{self.process_id}/job_{self.job_id}'
         output_url = f'{self.download_url}/out/{self.process_id}/job_{self.job_id}'
-        os.makedirs(output_dir, exist_ok=True)
+        docker_utils.make_output_dir(output_dir)
         LOGGER.debug(f'All results will be stored     in: {output_dir}')
         LOGGER.debug(f'All results will be accessible in: {output_url}')
         # Output filename
@@ -177,7 +176,8 @@ class NivaTilePlotProcessor(BaseProcessor):
             self.image_name,
             self.script_name,
             output_dir,
-            r_args
+            r_args,
+            job_id=self.job_id
         )
 
         # Return R error message if exit code not 0: